@@ -1,5 +1,8 @@
+from .documents import router as documents
+from .jobs import router as jobs
 from .image_processing import router as image_processing
 from .text_processing import router as text_processing
+from .vocab import router as vocab
 from .word_generation import router as word_generation
 
-__all__ = ["image_processing", "text_processing", "word_generation"] 
\ No newline at end of file
+__all__ = ["documents", "image_processing", "jobs", "text_processing", "vocab", "word_generation"] 
\ No newline at end of file
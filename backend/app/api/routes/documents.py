@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from app.core.settings import get_settings
+from app.models.schemas import DocumentRequest, DocumentAnalysisResponse
+from app.services.incremental_analysis import get_incremental_analyzer
+from app.services.resilience import UpstreamUnavailableError
+from app.core.deadline import DeadlineExceeded, RequestCancelled
+
+router = APIRouter()
+settings = get_settings()
+
+@router.post("/{document_id}/analyze", response_model=DocumentAnalysisResponse)
+async def analyze_document(document_id: str, request: DocumentRequest):
+    """Summarize a document version, reusing partial summaries of unchanged paragraphs."""
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+    if len(request.text) > settings.DOCUMENT_MAX_CHARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Text length must be less than {settings.DOCUMENT_MAX_CHARS} characters"
+        )
+    try:
+        return await get_incremental_analyzer().analyze(document_id, request.text, request.include_questions)
+    except (UpstreamUnavailableError, DeadlineExceeded, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
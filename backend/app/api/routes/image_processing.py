@@ -1,10 +1,18 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from PIL import Image
-import pytesseract
+from app.core.deadline import DeadlineExceeded, RequestCancelled
+from app.core.executor import run_blocking
+from app.core.metrics import span
+from app.services.ocr_service import OCRService, recognize
 import io
 
 router = APIRouter()
 
+def _image_to_string(image: Image.Image) -> str:
+    layout = OCRService.detect_layout(image)
+    with span("ocr_tesseract"):
+        return recognize(image, layout)
+
 @router.post("/process-image")
 async def process_image(file: UploadFile = File(...)):
     try:
@@ -16,11 +24,12 @@ async def process_image(file: UploadFile = File(...)):
             )
             
         # Read the image file
-        contents = await file.read()
+        with span("upload_read"):
+            contents = await file.read()
         image = Image.open(io.BytesIO(contents))
         
         # Extract text from image using OCR
-        extracted_text = pytesseract.image_to_string(image)
+        extracted_text = await run_blocking(_image_to_string, image)
         
         if not extracted_text.strip():
             return {
@@ -33,6 +42,8 @@ async def process_image(file: UploadFile = File(...)):
             "text": extracted_text.strip()
         }
         
+    except (DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
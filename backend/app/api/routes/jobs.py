@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from app.core.executor import run_blocking
+from app.core.metrics import record_cache, span
+from app.core.settings import get_settings
+from app.models.schemas import TextRequest
+from app.services.job_queue import FAILED, DONE, FINISHED_STATUSES, get_job_queue, public_job
+import asyncio
+import orjson
+
+router = APIRouter()
+settings = get_settings()
+
+def _detect_kind(file: UploadFile) -> str:
+    content_type = file.content_type or ""
+    filename = (file.filename or "").lower()
+    if content_type == "application/pdf" or filename.endswith(".pdf"):
+        return "pdf"
+    if content_type.startswith("image/"):
+        return "image"
+    if content_type.startswith("text/") or filename.endswith(".txt"):
+        return "text"
+    raise HTTPException(status_code=400, detail="File must be a PDF, an image or a text file")
+
+async def _submit(kind: str, payload: bytes, filename: str = None):
+    job, created = await run_blocking(get_job_queue().submit, kind, payload, filename)
+    # Resubmitting identical content returns the existing job instead of redoing the work
+    record_cache("jobs", hit=not created)
+    return {**public_job(job), "deduplicated": not created}
+
+async def _get_job(job_id: str):
+    job = await run_blocking(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("")
+async def submit_document(file: UploadFile = File(...)):
+    kind = _detect_kind(file)
+    with span("upload_read"):
+        payload = await file.read()
+    if len(payload) > settings.JOB_MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File size must be less than {settings.JOB_MAX_UPLOAD_MB}MB"
+        )
+    return await _submit(kind, payload, file.filename)
+
+@router.post("/text")
+async def submit_text(request: TextRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+    return await _submit("text", request.text.encode("utf-8"))
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    return public_job(await _get_job(job_id))
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await _get_job(job_id)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=422, detail=f"Job failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} ({job['stage']})")
+    result = job["result"]
+    return {
+        "job_id": job["id"],
+        "extracted_text": result.get("extract"),
+        "summary": result.get("summary"),
+        "questions": result.get("questions"),
+    }
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent progress events until the job finishes.
+
+    Polls the queue database, so it works whether the job runs in this
+    process or in a separate worker.
+    """
+    job = await _get_job(job_id)
+
+    async def events():
+        last_update = None
+        current = job
+        while True:
+            if current["updated_at"] != last_update:
+                last_update = current["updated_at"]
+                event = "progress" if current["status"] not in FINISHED_STATUSES else current["status"]
+                yield f"event: {event}\ndata: ".encode() + orjson.dumps(public_job(current)) + b"\n\n"
+            if current["status"] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+            current = await run_blocking(get_job_queue().get, job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
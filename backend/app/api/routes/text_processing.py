@@ -1,19 +1,22 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from app.models.schemas import TextRequest, TextResponse
-from app.services.openrouter_service import OpenRouterService
+from app.models.schemas import TextRequest, TextResponse, BatchPDFRequest
+from app.services.openrouter_service import get_openrouter_service
+from app.services.resilience import UpstreamUnavailableError
+from app.core.deadline import DeadlineExceeded, RequestCancelled
 from app.services.pdf_service import PDFService
+from app.core.executor import run_blocking
+from app.core.metrics import span
 from fastapi.responses import StreamingResponse
-import PyPDF2
-import io
 import sys
 
 router = APIRouter()
-openrouter_service = OpenRouterService()
+openrouter_service = get_openrouter_service()
 pdf_service = PDFService()
 
 # Add constants
 MAX_TEXT_LENGTH = 50000  # characters
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB in bytes
+MAX_BATCH_NOTES = 100
 
 @router.post("/summarize", response_model=TextResponse)
 async def summarize_text(request: TextRequest):
@@ -28,6 +31,8 @@ async def summarize_text(request: TextRequest):
             summary=summary,
             note_type="general"
         )
+    except (UpstreamUnavailableError, DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -39,6 +44,8 @@ async def generate_questions(request: TextRequest):
             questions=questions,
             note_type="general"
         )
+    except (UpstreamUnavailableError, DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,11 +66,11 @@ async def extract_pdf(file: UploadFile = File(...)):
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
             
-        content = await file.read()
-        pdf_file = io.BytesIO(content)
+        with span("upload_read"):
+            content = await file.read()
         
         # Read PDF
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        pdf_reader = await run_blocking(pdf_service.read_pdf, content)
         
         # Check number of pages
         if len(pdf_reader.pages) > 50:  # Limit to 50 pages
@@ -72,10 +79,8 @@ async def extract_pdf(file: UploadFile = File(...)):
                 detail="PDF must be less than 50 pages"
             )
             
-        text = ""
         # Extract text from all pages
-        for page in pdf_reader.pages:
-            text += page.extract_text()
+        text = await run_blocking(pdf_service.extract_text, pdf_reader)
             
         # Check text length
         if len(text) > MAX_TEXT_LENGTH:
@@ -84,14 +89,15 @@ async def extract_pdf(file: UploadFile = File(...)):
         return {"extracted_text": text.strip()}
         
     except Exception as e:
-        if isinstance(e, HTTPException):
+        if isinstance(e, (HTTPException, DeadlineExceeded, RequestCancelled)):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/download-pdf")
 async def download_pdf(request: TextRequest):
     try:
-        buffer = pdf_service.generate_pdf(
+        buffer = await run_blocking(
+            pdf_service.generate_pdf,
             title="AI Study Helper Notes",
             content=request.text,
             note_type=request.note_type if hasattr(request, 'note_type') else "General Notes"
@@ -104,5 +110,41 @@ async def download_pdf(request: TextRequest):
                 "Content-Disposition": "attachment; filename=study_notes.pdf"
             }
         )
+    except (DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/download-pdf/batch")
+async def download_batch_pdf(request: BatchPDFRequest):
+    if not request.notes:
+        raise HTTPException(status_code=400, detail="At least one note is required")
+    if len(request.notes) > MAX_BATCH_NOTES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch export is limited to {MAX_BATCH_NOTES} notes"
+        )
+    for note in request.notes:
+        if len(note.content) > MAX_TEXT_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Note '{note.title}' must be less than {MAX_TEXT_LENGTH} characters"
+            )
+
+    notes = [(note.title, note.note_type, note.content) for note in request.notes]
+    # Render before the response starts: once the PDF is streaming, a failure can't become a 500
+    try:
+        rendered = await pdf_service.render_batch(notes)
+    except Exception as e:
+        if isinstance(e, (DeadlineExceeded, RequestCancelled)):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Failed to render notes: {e}")
+
+    outline = [(note_title, note_type) for note_title, note_type, _ in notes]
+    return StreamingResponse(
+        pdf_service.stream_batch_pdf(request.title, outline, rendered),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": "attachment; filename=study_notes_batch.pdf"
+        }
+    )
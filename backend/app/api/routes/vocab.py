@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.services.vocab_store import CATEGORY_LEVELS, VocabStoreError, get_vocab_store
+
+router = APIRouter()
+
+MAX_RESULTS = 100
+
+def _store():
+    try:
+        return get_vocab_store()
+    except VocabStoreError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Vocabulary store unavailable: {e}. Build it with web/scripts/process_jp_words.py"
+        )
+
+def _check_level(level: Optional[int]):
+    if level is not None and level not in range(1, 6):
+        raise HTTPException(status_code=400, detail="Invalid level. Must be between 1 and 5")
+
+@router.get("/levels")
+async def get_levels():
+    return {"status": "success", "data": _store().counts()}
+
+@router.get("/random")
+async def get_random_vocab(
+    level: Optional[int] = None,
+    category: Optional[str] = None,
+    count: int = Query(10, ge=1, le=MAX_RESULTS)
+):
+    _check_level(level)
+    if category is not None and category.lower() not in CATEGORY_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid category. Must be one of: {', '.join(CATEGORY_LEVELS)}"
+        )
+    if level is not None:
+        levels = [level]
+    elif category is not None:
+        levels = CATEGORY_LEVELS[category.lower()]
+    else:
+        levels = [1, 2, 3, 4, 5]
+    return {"status": "success", "data": _store().random_words(levels, count)}
+
+@router.get("/search")
+async def search_vocab(
+    prefix: Optional[str] = None,
+    meaning: Optional[str] = None,
+    level: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=MAX_RESULTS)
+):
+    """Look words up by kana/romaji prefix or by a keyword in their English meaning."""
+    _check_level(level)
+    if bool(prefix) == bool(meaning):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'prefix' or 'meaning'")
+    store = _store()
+    if prefix:
+        words = store.search_prefix(prefix, level, limit)
+    else:
+        words = store.search_meaning(meaning, level, limit)
+    return {"status": "success", "data": words}
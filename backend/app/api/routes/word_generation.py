@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException
-from app.services.openrouter_service import OpenRouterService
+from app.services.openrouter_service import get_openrouter_service
+from app.services.resilience import UpstreamUnavailableError
+from app.core.deadline import DeadlineExceeded, RequestCancelled
+from app.core.logging_config import log_payload
 from typing import Dict, List
+import logging
 import random
 
 router = APIRouter()
-openrouter_service = OpenRouterService()
+logger = logging.getLogger(__name__)
+openrouter_service = get_openrouter_service()
 
 @router.get("/random", tags=["words"])
 async def get_random_words():
@@ -18,15 +23,17 @@ async def get_random_words():
         Make sure each array has exactly 10 words. Words should be appropriate for language learning."""
         
         word_sets = await openrouter_service.generate_word_sets(prompt)
-        print(f"OpenRouter API Response: {word_sets}")  # Debug print
+        log_payload(logger, "Generated word sets", word_sets)
         
         return {
             "status": "success",
             "data": word_sets
         }
         
+    except (UpstreamUnavailableError, DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
-        print(f"Error in get_random_words: {str(e)}")  # Debug print
+        logger.error("Error in get_random_words: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error generating random words: {str(e)}"
@@ -48,13 +55,15 @@ async def get_random_words_by_category(category: str):
         }}
         Make sure the array has exactly 10 words. Words should be appropriate for language learning."""
         
-        word_sets = await openrouter_service.generate_word_sets(prompt)
+        word_sets = await openrouter_service.generate_word_sets(prompt, [category])
         
         return {
             "status": "success",
             "data": word_sets[category]
         }
         
+    except (UpstreamUnavailableError, DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
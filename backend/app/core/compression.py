@@ -0,0 +1,163 @@
+import zlib
+from typing import Optional
+
+from app.core.deadline import mark_responding
+from app.core.executor import run_blocking
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Already compressed or must reach the client unbuffered
+EXCLUDED_CONTENT_TYPES = (
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/octet-stream",
+    "image/",
+    "audio/",
+    "video/",
+    "font/woff",
+    "text/event-stream",
+)
+
+# Bodies at least this large are compressed on the executor instead of the event loop
+THREAD_MIN_BYTES = 256 * 1024
+
+def parse_accept_encoding(header: str) -> dict:
+    """Map each accepted coding to its q-value."""
+    codings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[name] = quality
+    return codings
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Brotli when installed and accepted, otherwise gzip; None for identity."""
+    codings = parse_accept_encoding(header)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    wildcard = codings.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = codings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+class _Compressor:
+    """Incremental compressor so streamed bodies are compressed chunk by chunk."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self.compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.compressor.process(data)
+            return out + (self.compressor.finish() if final else self.compressor.flush())
+        out = self.compressor.compress(data)
+        # Sync-flush each streamed chunk so the client can decode it right away
+        return out + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip.
+
+    Small bodies (under minimum_size), responses that already carry a
+    Content-Encoding and binary / server-sent-event content types are passed
+    through untouched. Streaming responses are compressed per chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "passthrough": False, "compressor": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Held back here until the body is compressed, so DeadlineMiddleware hasn't seen
+                # it yet; without this a large body's run_blocking could fail the deadline check
+                mark_responding()
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+                state["passthrough"] = (
+                    b"content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or any(content_type.startswith(excluded) for excluded in EXCLUDED_CONTENT_TYPES)
+                )
+                if state["passthrough"]:
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk decides the encoding
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if state["start"] is not None:
+                start, state["start"] = state["start"], None
+                if not more_body and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [
+                    (name, value) for name, value in start.get("headers", [])
+                    if name.lower() not in (b"content-length", b"vary")
+                ]
+                vary = [value for name, value in start.get("headers", []) if name.lower() == b"vary"]
+                headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+                headers.append((b"content-encoding", encoding.encode()))
+                compressed = await self._compress(state["compressor"], body, not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            compressed = await self._compress(state["compressor"], body, not more_body)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _compress(self, compressor: _Compressor, body: bytes, final: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await run_blocking(compressor.compress, body, final)
+        return compressor.compress(body, final)
@@ -0,0 +1,167 @@
+"""Per-request deadlines and client-disconnect cancellation.
+
+DeadlineMiddleware gives every HTTP request a RequestBudget (a deadline
+plus a "client went away" flag) in a context variable. Code between
+pipeline stages calls check(); blocking work run through run_blocking sees
+the same budget because the context is copied into the executor thread.
+When the client disconnects, the request's task is cancelled, which
+cancels in-flight aiohttp calls and executor work that has not started.
+
+Outside a request (job workers, scripts) there is no budget and check()
+does nothing.
+"""
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before this stage."""
+
+class RequestCancelled(Exception):
+    """The client disconnected; the rest of the work would be thrown away."""
+
+class RequestBudget:
+    def __init__(self, timeout: float):
+        self.deadline = time.monotonic() + timeout
+        # threading.Event so executor threads can poll it too
+        self.cancelled = threading.Event()
+        # Once the response has started the work is done; late stages (compression) must not fail
+        self.responding = False
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+_budget: ContextVar[Optional[RequestBudget]] = ContextVar("request_budget", default=None)
+
+def current_budget() -> Optional[RequestBudget]:
+    return _budget.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None outside a request."""
+    budget = _budget.get()
+    return None if budget is None else budget.remaining()
+
+def check(stage: str) -> None:
+    """Raise if the current request was abandoned or is out of time before `stage` starts."""
+    budget = _budget.get()
+    if budget is None or budget.responding:
+        return
+    if budget.cancelled.is_set():
+        raise RequestCancelled(f"Client disconnected before {stage}")
+    if budget.remaining() <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded before {stage}")
+
+def clamp_timeout(timeout: float) -> float:
+    """Shorten a per-call timeout so it never outlives the request."""
+    budget = _budget.get()
+    if budget is None or budget.responding:
+        return timeout
+    return max(0.0, min(timeout, budget.remaining()))
+
+def mark_responding() -> None:
+    """The app has produced its response; stages after this (compression) must not be cut off."""
+    budget = _budget.get()
+    if budget is not None:
+        budget.responding = True
+
+def _request_timeout(scope) -> float:
+    # Clients may ask for a shorter deadline than the server maximum
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-timeout":
+            try:
+                return max(0.0, min(float(value), settings.REQUEST_TIMEOUT_SECONDS))
+            except ValueError:
+                break
+    return settings.REQUEST_TIMEOUT_SECONDS
+
+def _expects_body(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"transfer-encoding":
+            return True
+        if name == b"content-length":
+            return value.strip() not in (b"", b"0")
+    return False
+
+class DeadlineMiddleware:
+    """ASGI middleware attaching a RequestBudget and cancelling the request when the client disconnects.
+
+    Until the app has read the whole request body, receive() passes straight
+    through. After that a watcher owns receive() and waits for
+    http.disconnect, so disconnects are noticed even while the app is busy
+    in OCR, PDF parsing or an upstream call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = RequestBudget(_request_timeout(scope))
+        token = _budget.set(budget)
+        messages: asyncio.Queue = asyncio.Queue()
+        state = {"watching": False, "response_started": False, "response_done": False}
+        watcher: Optional[asyncio.Task] = None
+        loop = asyncio.get_running_loop()
+
+        def client_gone() -> None:
+            if not state["response_done"] and not budget.cancelled.is_set():
+                budget.cancelled.set()
+                app_task.cancel()
+
+        async def watch() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    client_gone()
+                    return
+
+        def start_watching() -> None:
+            nonlocal watcher
+            state["watching"] = True
+            watcher = loop.create_task(watch())
+
+        async def receive_wrapper():
+            if state["watching"]:
+                return await messages.get()
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                client_gone()
+            elif not message.get("more_body", False):
+                start_watching()
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["response_started"] = True
+                budget.responding = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["response_done"] = True
+            await send(message)
+
+        if not _expects_body(scope):
+            start_watching()
+        app_task = loop.create_task(self.app(scope, receive_wrapper, send_wrapper))
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not budget.cancelled.is_set():
+                # Cancelled from outside (server shutdown), not by a disconnect
+                raise
+            # Nobody is listening; record the abandonment for metrics (499, as nginx does)
+            if not state["response_started"]:
+                await send({"type": "http.response.start", "status": 499, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            _budget.reset(token)
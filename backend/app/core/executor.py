@@ -0,0 +1,81 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from app.core.deadline import check
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_state = {"queued": 0, "running": 0, "completed": 0}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.EXECUTOR_WORKERS,
+            thread_name_prefix="blocking"
+        )
+    return _executor
+
+def _tracked(func: Callable[..., T]) -> Callable[..., T]:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            _state["queued"] -= 1
+            _state["running"] += 1
+        try:
+            # Work queued behind a busy pool may outlive its request; skip it
+            check(f"running {getattr(func, '__name__', 'blocking work')}")
+            return func(*args, **kwargs)
+        finally:
+            with _lock:
+                _state["running"] -= 1
+                _state["completed"] += 1
+    return wrapper
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run CPU-bound or blocking work (OCR, PDF parsing/rendering) off the event loop.
+
+    The caller's context (including its request deadline) is carried into the
+    worker thread. Cancelling the awaiting task drops work that is still queued.
+    """
+    with _lock:
+        _state["queued"] += 1
+    context = contextvars.copy_context()
+    future = _get_executor().submit(context.run, _tracked(func), *args, **kwargs)
+    future.add_done_callback(_forget_if_cancelled)
+    return await asyncio.wrap_future(future)
+
+def _forget_if_cancelled(future) -> None:
+    # Work cancelled while still queued never reaches the wrapper
+    if future.cancelled():
+        with _lock:
+            _state["queued"] -= 1
+
+def _reset_after_fork() -> None:
+    # Worker threads do not survive fork (gunicorn --preload); build a new pool on first use
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+    _state.update(queued=0, running=0, completed=0)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def executor_stats() -> Dict[str, int]:
+    with _lock:
+        return {
+            "queue_depth": _state["queued"],
+            "running": _state["running"],
+            "completed": _state["completed"],
+            "max_workers": settings.EXECUTOR_WORKERS,
+        }
@@ -0,0 +1,120 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+import orjson
+
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+APP_LOGGER = "app"
+
+_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the listener thread, not the event loop."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+class _PreparedQueueHandler(QueueHandler):
+    """Only merge the message args on the caller's thread; JSON encoding happens in the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_logging(config=settings, stream=None) -> logging.Logger:
+    """Route the `app` logger through a queue so handlers never block request handling.
+
+    Levels follow DEBUG (DEBUG -> debug, otherwise info) unless LOG_LEVEL is set.
+    Safe to call more than once; later calls replace the previous listener.
+    """
+    global _listener
+
+    level_name = config.LOG_LEVEL or ("DEBUG" if config.DEBUG else "INFO")
+    logger = logging.getLogger(APP_LOGGER)
+    logger.setLevel(level_name.upper())
+    logger.propagate = False
+
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if config.LOG_JSON:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(_PreparedQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    return logger
+
+def shutdown_logging() -> None:
+    """Flush queued records; registered at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork (gunicorn --preload), so the
+    # child starts its own on a fresh queue
+    global _listener
+    if _listener is None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in logging.getLogger(APP_LOGGER).handlers:
+        if isinstance(handler, _PreparedQueueHandler):
+            handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers, respect_handler_level=False)
+    _listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, **fields) -> None:
+    """Log (a truncated copy of) a request/response payload for a sampled fraction of calls.
+
+    Payloads can hold user content and scale with response size, so they are
+    only logged at DEBUG level and only for LOG_PAYLOAD_SAMPLE_RATE of calls.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else str(payload)
+    fields["payload_chars"] = len(text)
+    if len(text) > settings.LOG_PAYLOAD_MAX_CHARS:
+        text = text[:settings.LOG_PAYLOAD_MAX_CHARS] + "...[truncated]"
+    fields["payload"] = text
+    logger.debug(message, extra={"fields": fields})
@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+# Latency buckets in seconds, from fast in-process stages up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], List] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self.series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            snapshot = list(self.values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+class CallbackGauges:
+    """Gauges read from a callback at scrape time, e.g. the upstream guard's state dict."""
+
+    def __init__(self, prefix: str, documentation: str, callback: Callable[[], Dict]):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, value in self.callback().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# HELP {name} {self.documentation} ({key})")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "study_helper_http_request_seconds",
+    "End-to-end HTTP request latency",
+    ["method", "route", "status"]
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "study_helper_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage"]
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "study_helper_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+))
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+def span(stage: str):
+    """Time a block as `stage`; a shared no-op when METRICS_ENABLED is off."""
+    if not settings.METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage whose start and end are not in one block (e.g. first token)."""
+    if settings.METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+
+def record_cache(cache: str, hit: bool) -> None:
+    if settings.METRICS_ENABLED:
+        CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+def route_template(scope) -> str:
+    """Full path template of the matched route, e.g. "/api/jobs/{job_id}".
+
+    Depending on the FastAPI/Starlette version, scope["route"] of a route in an
+    included router (or under a Mount) may only know its own path ("/random"),
+    not the prefix it was included under. The prefix is recovered as the part
+    of the request path in front of what the route's own pattern matches.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not path_format:
+        return "unmatched"
+    path_regex = getattr(route, "path_regex", None)
+    path = scope.get("path", "")
+    if path_regex is None:
+        return path_format
+    # Shortest prefix first: a route that already carries its prefix matches the whole path
+    for index, char in enumerate(path):
+        if char == "/" and path_regex.match(path[index:]):
+            return path[:index] + path_format
+    return path_format
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template, never the raw path, to keep cardinality bounded
+            route = route_template(scope)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route,
+                str(status["code"])
+            )
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 import os
 from dotenv import load_dotenv
@@ -32,6 +32,35 @@ class Settings(BaseSettings):
     
     # Debug settings
     DEBUG: bool = True
+
+    # Logging settings
+    LOG_LEVEL: Optional[str] = None  # defaults to DEBUG when DEBUG is on, INFO otherwise
+    LOG_JSON: bool = True
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01  # fraction of calls whose payloads are logged at DEBUG
+    LOG_PAYLOAD_MAX_CHARS: int = 500
+
+    # Metrics and blocking-work settings
+    METRICS_ENABLED: bool = True
+    EXECUTOR_WORKERS: int = 4  # threads for OCR / PDF work kept off the event loop
+    PDF_BATCH_WORKERS: int = 2  # processes rendering batch-export notes (reportlab holds the GIL)
+    # End-to-end budget per HTTP request; clients can ask for less with X-Request-Timeout
+    REQUEST_TIMEOUT_SECONDS: float = 120.0
+
+    # Response compression (brotli when the package is installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # low qualities are fast enough for per-request compression
+
+    # OCR: pick eng / jpn / jpn_vert and the page segmentation mode per image
+    OCR_AUTO_LANGUAGE: bool = True
+    OCR_DEFAULT_LANGUAGE: str = "eng"
+
+    # Warm-up run at startup; /ready fails until it has finished (/health stays a liveness check)
+    WARMUP_STEPS: List[str] = ["upstream", "ocr"]
+    WARMUP_UPSTREAM_CONNECTIONS: int = 2  # pooled connections to open (TLS handshakes done up front)
+    WARMUP_DUMMY_INFERENCE: bool = False  # also run a 1-token completion (costs a request)
+    WARMUP_STEP_TIMEOUT_SECONDS: float = 30.0
     
     # Model settings
     MODEL_PATH: str = "facebook/bart-large-cnn"
@@ -42,6 +71,73 @@ class Settings(BaseSettings):
     # OpenRouter settings
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY")
     OPENROUTER_MODEL: str = os.getenv("OPENROUTER_MODEL", "gpt-3.5-turbo")
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+
+    # Upstream resilience settings
+    OPENROUTER_MAX_CONCURRENCY: int = 8
+    OPENROUTER_RATE_LIMIT_PER_MINUTE: int = 60
+    OPENROUTER_TIMEOUT_SECONDS: float = 60.0
+    OPENROUTER_MAX_RETRIES: int = 3
+    OPENROUTER_BACKOFF_BASE_SECONDS: float = 0.5
+    OPENROUTER_BACKOFF_MAX_SECONDS: float = 10.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0
+    # Share the rate limit across worker processes (on by default in gunicorn.conf.py)
+    OPENROUTER_SHARED_RATE_LIMIT: bool = False
+
+    # Model routing: per-endpoint model (defaults to OPENROUTER_MODEL), then fallbacks in order
+    OPENROUTER_SUMMARY_MODEL: Optional[str] = None
+    OPENROUTER_QUESTIONS_MODEL: Optional[str] = None
+    OPENROUTER_WORDS_MODEL: Optional[str] = None
+    OPENROUTER_FALLBACK_MODELS: List[str] = []
+
+    # Hedged requests: fire a backup when the first byte is slower than the observed quantile
+    HEDGE_ENABLED: bool = False
+    HEDGE_QUANTILE: float = 0.95
+    HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    HEDGE_MAX_RATIO: float = 0.1  # at most 10% of calls may send a backup request
+    HEDGE_MIN_SAMPLES: int = 20
+
+    # Response handling
+    OPENROUTER_STREAM: bool = False
+    OPENROUTER_STRUCTURED_OUTPUT: bool = True  # send JSON-schema response_format where supported
+    LLM_TOPUP_ATTEMPTS: int = 2  # follow-up requests for missing questions/words before giving up
+
+    # Local storage
+    DATA_DIR: str = "data"
+    SHARED_STATE_PATH: Optional[str] = None  # cross-worker counters, defaults to DATA_DIR/shared_state.db
+
+    # Background jobs
+    JOBS_DB_PATH: Optional[str] = None  # defaults to DATA_DIR/jobs.db
+    JOB_WORKERS: int = 1  # in-process workers; 0 when running `python -m app.services.job_worker` separately
+    JOB_POLL_INTERVAL_SECONDS: float = 0.5
+    JOB_LEASE_SECONDS: float = 300.0  # renewed every third of this while a job runs; a stalled worker's job is picked up again
+    JOB_MAX_ATTEMPTS: int = 3  # runs per job, counting reclaims after a lost lease
+    JOB_RETRY_BACKOFF_SECONDS: float = 10.0  # doubled per attempt, unless the upstream sent Retry-After
+    JOB_MAX_PDF_PAGES: int = 200
+    JOB_MAX_UPLOAD_MB: int = 20
+
+    # Incremental document analysis
+    DOCUMENTS_DB_PATH: Optional[str] = None  # defaults to DATA_DIR/documents.db
+    DOCUMENT_SEGMENT_TARGET_CHARS: int = 1500  # average segment size; boundaries fall after content-chosen paragraphs
+    DOCUMENT_SEGMENT_CONCURRENCY: int = 4  # segment summaries requested at once per document
+    DOCUMENT_MAX_VERSIONS: int = 5
+    DOCUMENT_SEGMENT_MAX_AGE_DAYS: float = 30.0  # partial summaries no kept version uses are deleted after this; 0 = never by age
+    DOCUMENT_MAX_CHARS: int = 500000
+
+    # Near-duplicate cache for summaries and questions (MinHash over character shingles), keyed by
+    # model chain and prompt version. Off by default: a hit returns another text's result, so opt in
+    # where re-scans of the same pages are common (see README)
+    SIMILARITY_CACHE_ENABLED: bool = False
+    SIMILARITY_CACHE_PATH: Optional[str] = None  # defaults to DATA_DIR/similarity.db
+    # Estimated Jaccard similarity of 5-character shingles. A re-scan with 1-2% OCR character errors
+    # scores 0.80-0.95; rewriting ~10% of a page also scores ~0.83, and different pages stay below 0.1
+    SIMILARITY_THRESHOLD: float = 0.8
+    SIMILARITY_MIN_CHARS: int = 200  # shorter texts are too noisy to match reliably
+    SIMILARITY_CACHE_MAX_ENTRIES: int = 20000
+
+    # JLPT vocabulary store built by web/scripts/process_jp_words.py
+    VOCAB_STORE_PATH: Optional[str] = None  # defaults to DATA_DIR/words_ja.bin
 
     class Config:
         env_file = ".env"
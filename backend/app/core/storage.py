@@ -0,0 +1,25 @@
+import os
+import sqlite3
+
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+def data_path(filename: str) -> str:
+    """Path for a local data file under DATA_DIR, creating the directory if needed."""
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    return os.path.join(settings.DATA_DIR, filename)
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode so readers never block the writer.
+
+    Connections may be shared across threads (calls are serialized by the
+    callers' own locks) and wait instead of failing when another process
+    holds the write lock.
+    """
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    return connection
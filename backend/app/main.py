@@ -1,15 +1,35 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.settings import get_settings
+from app.core.logging_config import setup_logging
+from app.core.metrics import REGISTRY, CallbackGauges, MetricsMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.deadline import DeadlineExceeded, DeadlineMiddleware, RequestCancelled
+from app.core.responses import ORJSONResponse
+from app.core.executor import executor_stats
+from app.services.openrouter_service import get_openrouter_service
+from app.services.resilience import UpstreamUnavailableError, get_upstream_guard
+from app.services.routing import get_model_router
 from app.api.routes.text_processing import router as text_router
 from app.api.routes.image_processing import router as image_router
 from app.api.routes.word_generation import router as word_router
+from app.api.routes.jobs import router as jobs_router
+from app.api.routes.documents import router as documents_router
+from app.api.routes.vocab import router as vocab_router
+from app.services.job_queue import get_job_queue
+from app.services.job_worker import worker_loop
+from app.services.warmup import get_warmup
+from app.services.pdf_service import shutdown_batch_executor
+import asyncio
+import logging
 import os
-import sys
 
 settings = get_settings()
+setup_logging(settings)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Study Helper API")
+app = FastAPI(title="AI Study Helper API", default_response_class=ORJSONResponse)
 
 # Updated CORS configuration
 app.add_middleware(
@@ -21,28 +41,117 @@ app.add_middleware(
     expose_headers=["*"],
     max_age=3600,
 )
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_BYTES,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY
+    )
+# Inside metrics so abandoned requests are counted (as 499s)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+REGISTRY.register(CallbackGauges("study_helper_executor", "Blocking work executor", executor_stats))
+REGISTRY.register(CallbackGauges("study_helper_upstream", "OpenRouter guard state", lambda: get_upstream_guard().metrics()))
+REGISTRY.register(CallbackGauges("study_helper_jobs", "Background jobs by status", lambda: get_job_queue().counts()))
+REGISTRY.register(CallbackGauges("study_helper_warmup", "Startup warm-up", lambda: get_warmup().metrics()))
 
 try:
     # Include routers with their new names
     app.include_router(text_router, prefix="/api", tags=["text"])
     app.include_router(image_router, prefix="/api", tags=["image"])
     app.include_router(word_router, prefix="/api/words", tags=["words"])
+    app.include_router(jobs_router, prefix="/api/jobs", tags=["jobs"])
+    app.include_router(documents_router, prefix="/api/documents", tags=["documents"])
+    app.include_router(vocab_router, prefix="/api/vocab", tags=["vocab"])
 except Exception as e:
-    print(f"Error importing routes: {str(e)}", file=sys.stderr)
-    print(f"Current directory: {os.getcwd()}", file=sys.stderr)
-    print(f"Directory contents: {os.listdir('.')}", file=sys.stderr)
-    print(f"App directory contents: {os.listdir('app')}", file=sys.stderr)
-    print(f"Routes directory contents: {os.listdir('app/api/routes')}", file=sys.stderr)
+    logger.error("Error importing routes: %s", e)
+    logger.error("Current directory: %s", os.getcwd())
+    logger.error("Directory contents: %s", os.listdir('.'))
+    logger.error("App directory contents: %s", os.listdir('app'))
+    logger.error("Routes directory contents: %s", os.listdir('app/api/routes'))
     raise
 
+@app.exception_handler(UpstreamUnavailableError)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailableError):
+    # Tell clients when to come back instead of surfacing a generic 500
+    retry_after = max(1, int(exc.retry_after or 1))
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(retry_after)}
+    )
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return ORJSONResponse(status_code=504, content={"detail": str(exc)})
+
+@app.exception_handler(RequestCancelled)
+async def request_cancelled_handler(request: Request, exc: RequestCancelled):
+    # The client is gone; the status only shows up in metrics and logs
+    return ORJSONResponse(status_code=499, content={"detail": str(exc)})
+
+job_workers = {"stop": None, "tasks": []}
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_workers["stop"] = asyncio.Event()
+    job_workers["tasks"] = [
+        asyncio.create_task(worker_loop(i, stop=job_workers["stop"]))
+        for i in range(settings.JOB_WORKERS)
+    ]
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_workers["stop"] is not None:
+        job_workers["stop"].set()
+    for task in job_workers["tasks"]:
+        task.cancel()
+    await asyncio.gather(*job_workers["tasks"], return_exceptions=True)
+
+warmup_task = {"task": None}
+
+@app.on_event("startup")
+async def start_warmup():
+    # In the background: liveness (/health) must answer while this runs
+    warmup_task["task"] = asyncio.create_task(get_warmup().run())
+
+@app.on_event("shutdown")
+async def stop_warmup():
+    task = warmup_task["task"]
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+@app.on_event("shutdown")
+async def close_upstream_session():
+    await get_openrouter_service().close()
+
+@app.on_event("shutdown")
+def stop_batch_pdf_workers():
+    shutdown_batch_executor()
+
 @app.get("/health")
 def health_check():
+    # Liveness only; see /ready for whether the instance should take traffic
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    warmup = get_warmup()
+    if not warmup.ready:
+        return ORJSONResponse(status_code=503, content=warmup.report())
+    return warmup.report()
+
 @app.get("/")
 async def root():
     return {"status": "healthy", "message": "AI Study Helper API is running"} 
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/debug/routes")
 async def debug_routes():
     routes = []
@@ -50,6 +159,13 @@ async def debug_routes():
         routes.append(str(route))
     return {"routes": routes}
 
+@app.get("/debug/upstream")
+async def debug_upstream():
+    return {
+        **get_upstream_guard().metrics(),
+        "routing": get_model_router().metrics()
+    }
+
 @app.get("/api/test")
 async def test():
     return {"message": "Test endpoint working"}
@@ -10,5 +10,27 @@ class TextResponse(BaseModel):
     note_type: Optional[str] = None
     foreign_terms: Optional[List[str]] = None
 
+class NoteItem(BaseModel):
+    title: str
+    note_type: str = "General Notes"
+    content: str
+
+class BatchPDFRequest(BaseModel):
+    title: str = "AI Study Helper Notes"
+    notes: List[NoteItem]
+
+class DocumentRequest(BaseModel):
+    text: str
+    include_questions: bool = True
+
+class DocumentAnalysisResponse(BaseModel):
+    document_id: str
+    version: int
+    summary: str
+    questions: Optional[List[str]] = None
+    segments: int
+    changed_segments: List[int]
+    segments_recomputed: int
+
 class ErrorResponse(BaseModel):
-    detail: str 
\ No newline at end of file
+    detail: str 
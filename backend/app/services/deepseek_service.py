@@ -1,6 +1,9 @@
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import logging
 import torch
 
+logger = logging.getLogger(__name__)
+
 class DeepseekService:
     def __init__(self):
         self.model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-large")
@@ -73,7 +76,7 @@ class DeepseekService:
             return summary.strip()
 
         except Exception as e:
-            print(f"Error generating summary: {str(e)}")
+            logger.error("Error generating summary: %s", e)
             raise e
 
     async def generate_questions(self, text: str) -> list:
@@ -129,5 +132,5 @@ class DeepseekService:
             return questions[:5]
 
         except Exception as e:
-            print(f"Error generating questions: {str(e)}")
+            logger.error("Error generating questions: %s", e)
             raise e 
\ No newline at end of file
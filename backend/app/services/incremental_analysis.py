@@ -0,0 +1,283 @@
+"""Incremental summaries for documents that are edited and re-analyzed.
+
+A document is split into content-defined, paragraph-aligned segments. Each segment's partial
+summary is stored under the hash of its text, so re-analyzing an edited
+version only summarizes the segments that changed and then re-runs the
+final merge over the (short) partial summaries.
+
+Partial summaries are dropped once no kept version of any document uses
+them: right away for the segments of versions pruned by a save, and by age
+(DOCUMENT_SEGMENT_MAX_AGE_DAYS) for ones never saved in a version, e.g.
+from an analysis that failed halfway.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import orjson
+
+from app.core.executor import run_blocking
+from app.core.metrics import record_cache
+from app.core.settings import get_settings
+from app.core.storage import connect, data_path
+from app.services.openrouter_service import get_openrouter_service
+
+settings = get_settings()
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Hashes used by a kept version; JSON1 is built into the SQLite shipped with Python
+REFERENCED_HASHES = "SELECT DISTINCT value FROM document_versions, json_each(document_versions.segment_hashes)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segment_summaries (
+    hash TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_versions (
+    document_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    segment_hashes TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    questions TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (document_id, version)
+);
+"""
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+def _ends_segment(paragraph: str, target_chars: int) -> bool:
+    """Whether a segment boundary follows this paragraph, decided by its own text alone.
+
+    A paragraph of n characters ends a segment with probability n / target_chars
+    (always, once it is that long), so segments average about target_chars.
+    """
+    normalized = _normalize(paragraph)
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % target_chars < len(normalized)
+
+def split_segments(text: str, target_chars: int) -> List[str]:
+    """Split text on blank lines into content-defined segments of about target_chars.
+
+    Whether a paragraph closes a segment depends only on that paragraph's
+    text, not on how much came before it. Editing paragraph k therefore only
+    changes the segment holding it (plus the next one if the edit moves the
+    boundary after k); every other segment keeps its text and hash. Runs of
+    paragraphs with no boundary are still cut at 4 * target_chars so one
+    segment can't grow without bound.
+    """
+    segments: List[str] = []
+    current: List[str] = []
+    length = 0
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        current.append(paragraph)
+        length += len(paragraph)
+        if _ends_segment(paragraph, target_chars) or length >= 4 * target_chars:
+            segments.append("\n\n".join(current))
+            current, length = [], 0
+    if current:
+        segments.append("\n\n".join(current))
+    return segments
+
+def segment_hash(segment: str) -> str:
+    # Whitespace-only changes (re-wrapped lines) keep the same hash
+    return hashlib.sha256(_normalize(segment).encode("utf-8")).hexdigest()
+
+class DocumentStore:
+    """SQLite store of partial summaries by segment hash and of document versions."""
+
+    def __init__(self, path: str, max_versions: int, max_segment_age: float = 0):
+        self.connection = connect(path)
+        self.lock = threading.Lock()
+        self.max_versions = max_versions
+        # Seconds; 0 keeps unreferenced partial summaries until their versions are pruned
+        self.max_segment_age = max_segment_age
+        self.last_age_prune = 0.0
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+
+    def segment_summaries(self, hashes: List[str]) -> Dict[str, str]:
+        if not hashes:
+            return {}
+        unique = list(set(hashes))
+        found: Dict[str, str] = {}
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT hash, summary FROM segment_summaries WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update({row["hash"]: row["summary"] for row in rows})
+        return found
+
+    def save_segment_summaries(self, summaries: Dict[str, str]) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO segment_summaries (hash, summary, created_at) VALUES (?, ?, ?)",
+                [(key, summary, now) for key, summary in summaries.items()]
+            )
+
+    def latest_version(self, document_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM document_versions WHERE document_id = ? ORDER BY version DESC LIMIT 1",
+                (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        version = dict(row)
+        version["segment_hashes"] = orjson.loads(version["segment_hashes"])
+        version["questions"] = orjson.loads(version["questions"]) if version["questions"] else None
+        return version
+
+    def save_version(self, document_id: str, hashes: List[str], summary: str, questions: Optional[List[str]]) -> int:
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute(
+                    "SELECT COALESCE(MAX(version), 0) AS version FROM document_versions WHERE document_id = ?",
+                    (document_id,)
+                ).fetchone()
+                version = row["version"] + 1
+                pruned = self.connection.execute(
+                    "SELECT segment_hashes FROM document_versions WHERE document_id = ? AND version <= ?",
+                    (document_id, version - self.max_versions)
+                ).fetchall()
+                self.connection.execute(
+                    "INSERT INTO document_versions (document_id, version, segment_hashes, summary, questions, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        document_id, version, orjson.dumps(hashes).decode(), summary,
+                        orjson.dumps(questions).decode() if questions is not None else None, now
+                    )
+                )
+                # Only the latest versions are needed to diff against
+                self.connection.execute(
+                    "DELETE FROM document_versions WHERE document_id = ? AND version <= ?",
+                    (document_id, version - self.max_versions)
+                )
+                dropped = {key for row in pruned for key in orjson.loads(row["segment_hashes"])} - set(hashes)
+                if dropped:
+                    self._delete_unreferenced(list(dropped))
+                if self.max_segment_age and now - self.last_age_prune >= min(self.max_segment_age, 3600):
+                    # A full scan of the versions, so at most once an hour
+                    self.connection.execute(
+                        f"DELETE FROM segment_summaries WHERE created_at < ? AND hash NOT IN ({REFERENCED_HASHES})",
+                        (now - self.max_segment_age,)
+                    )
+                    self.last_age_prune = now
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return version
+
+    def _delete_unreferenced(self, hashes: List[str]) -> None:
+        """Delete these partial summaries unless a kept version (of any document) still uses them."""
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            self.connection.execute(
+                f"DELETE FROM segment_summaries WHERE hash IN ({','.join('?' * len(chunk))}) "
+                f"AND hash NOT IN ({REFERENCED_HASHES})",
+                chunk
+            )
+
+class IncrementalAnalyzer:
+    def __init__(self, store: DocumentStore, segment_chars: int, concurrency: int):
+        self.store = store
+        self.segment_chars = segment_chars
+        # Upstream calls in flight per analysis; a long new document must not take the whole rate limit
+        self.concurrency = max(1, concurrency)
+
+    async def analyze(self, document_id: str, text: str, include_questions: bool = True) -> Dict:
+        """Summarize (and optionally generate questions for) a new version of a document.
+
+        Only segments whose hash has no stored partial summary are sent
+        upstream; unchanged documents are answered from the stored version.
+        Questions are not cached per segment: any edit regenerates them with
+        one call over the short partial summaries.
+        """
+        openrouter_service = get_openrouter_service()
+        segments = split_segments(text, self.segment_chars)
+        if not segments:
+            raise ValueError("Document has no text")
+        hashes = [segment_hash(segment) for segment in segments]
+
+        previous = await run_blocking(self.store.latest_version, document_id)
+        previous_hashes = set(previous["segment_hashes"]) if previous else set()
+        changed = [i for i, key in enumerate(hashes) if key not in previous_hashes]
+
+        if previous and previous["segment_hashes"] == hashes and (previous["questions"] is not None or not include_questions):
+            record_cache("documents", hit=True)
+            return self._result(document_id, previous["version"], previous["summary"],
+                                previous["questions"] if include_questions else None, hashes, changed, 0)
+        record_cache("documents", hit=False)
+
+        partials = await run_blocking(self.store.segment_summaries, hashes)
+        missing = {key: segment for key, segment in zip(hashes, segments) if key not in partials}
+        for key in hashes:
+            record_cache("segments", hit=key not in missing)
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def summarize(key: str, segment: str) -> None:
+                async with semaphore:
+                    partial = await openrouter_service.summarize_segment(segment)
+                # Save right away so a later failure doesn't throw finished segments away
+                await run_blocking(self.store.save_segment_summaries, {key: partial})
+                partials[key] = partial
+
+            # Let the other segments finish (and be saved) before reporting a failure
+            results = await asyncio.gather(*(summarize(key, segment) for key, segment in missing.items()), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+        ordered = [partials[key] for key in hashes]
+        if len(segments) == 1:
+            summary = ordered[0]
+            question_source = segments[0]
+        else:
+            summary = await openrouter_service.merge_summaries(ordered)
+            # Questions come from the partial summaries, so their cost stays bounded as the document grows
+            question_source = "\n\n".join(ordered)
+
+        questions = await openrouter_service.generate_questions(question_source, reuse_similar=False) if include_questions else None
+        version = await run_blocking(self.store.save_version, document_id, hashes, summary, questions)
+        return self._result(document_id, version, summary, questions, hashes, changed, len(missing))
+
+    def _result(self, document_id: str, version: int, summary: str, questions: Optional[List[str]],
+                hashes: List[str], changed: List[int], recomputed: int) -> Dict:
+        return {
+            "document_id": document_id,
+            "version": version,
+            "summary": summary,
+            "questions": questions,
+            "segments": len(hashes),
+            "changed_segments": changed,
+            "segments_recomputed": recomputed,
+        }
+
+@lru_cache()
+def get_incremental_analyzer() -> IncrementalAnalyzer:
+    store = DocumentStore(
+        settings.DOCUMENTS_DB_PATH or data_path("documents.db"),
+        settings.DOCUMENT_MAX_VERSIONS,
+        settings.DOCUMENT_SEGMENT_MAX_AGE_DAYS * 86400
+    )
+    return IncrementalAnalyzer(store, settings.DOCUMENT_SEGMENT_TARGET_CHARS, settings.DOCUMENT_SEGMENT_CONCURRENCY)
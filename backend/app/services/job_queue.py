@@ -0,0 +1,212 @@
+import hashlib
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+from app.core.settings import get_settings
+from app.core.storage import connect, data_path
+
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    filename TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    payload BLOB,
+    result TEXT,
+    error TEXT,
+    locked_until REAL,
+    not_before REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_content_hash ON jobs (content_hash);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+def content_hash(kind: str, payload: bytes) -> str:
+    """Idempotency key: the same document submitted for the same kind of job."""
+    digest = hashlib.sha256()
+    digest.update(kind.encode())
+    digest.update(b"\0")
+    digest.update(payload)
+    return digest.hexdigest()
+
+class JobQueue:
+    """Persistent document-processing queue backed by SQLite.
+
+    Workers in this process or in separate processes claim jobs with a lease;
+    a job whose worker dies is picked up again once its lease expires.
+    """
+
+    def __init__(self, path: str):
+        self.connection = connect(path)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+            # Databases created before retry backoff lack the column
+            columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(jobs)")}
+            if "not_before" not in columns:
+                self.connection.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+
+    def _row_to_job(self, row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("payload", None)
+        job["result"] = orjson.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind: str, payload: bytes, filename: Optional[str] = None) -> Tuple[Dict, bool]:
+        """Queue a job, or return the existing one for identical content.
+
+        Returns (job, created). A previously failed job is re-queued, keeping
+        any stage results it had already produced.
+        """
+        key = content_hash(kind, payload)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE content_hash = ?", (key,)).fetchone()
+            if row is not None:
+                if row["status"] == FAILED:
+                    self.connection.execute(
+                        "UPDATE jobs SET status = ?, error = NULL, attempts = 0, not_before = NULL, updated_at = ? WHERE id = ?",
+                        (QUEUED, now, row["id"])
+                    )
+                    row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                return self._row_to_job(row), False
+
+            job_id = uuid.uuid4().hex
+            self.connection.execute(
+                "INSERT INTO jobs (id, content_hash, kind, filename, status, stage, progress, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, key, kind, filename, QUEUED, "queued", payload, now, now)
+            )
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._row_to_job(row), True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def claim(self, lease_seconds: float, max_attempts: int) -> Optional[Dict]:
+        """Atomically take the oldest queued job that is due (or one whose lease expired).
+
+        A job whose lease has expired max_attempts times is marked failed
+        instead: it most likely crashes the worker that runs it.
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self.connection.execute(
+                        "SELECT * FROM jobs WHERE (status = ? AND (not_before IS NULL OR not_before <= ?)) "
+                        "OR (status = ? AND locked_until < ?) ORDER BY created_at LIMIT 1",
+                        (QUEUED, now, RUNNING, now)
+                    ).fetchone()
+                    if row is None or not (row["status"] == RUNNING and row["attempts"] >= max_attempts):
+                        break
+                    self.connection.execute(
+                        "UPDATE jobs SET status = ?, error = ?, locked_until = NULL, updated_at = ? WHERE id = ?",
+                        (FAILED, f"Worker lost the job {row['attempts']} times (lease expired)", now, row["id"])
+                    )
+                if row is None:
+                    self.connection.execute("COMMIT")
+                    return None
+                self.connection.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now + lease_seconds, now, row["id"])
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["payload"] = row["payload"]
+        job["attempts"] += 1
+        return job
+
+    def renew(self, job_id: str, attempts: int, lease_seconds: float) -> bool:
+        """Extend the lease of a running job; False once another worker has reclaimed it.
+
+        `attempts` is the value from claim(): a reclaim increments it, so it
+        tells this worker's lease apart from the next one.
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET locked_until = ?, updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (now + lease_seconds, now, job_id, RUNNING, attempts)
+            )
+        return cursor.rowcount == 1
+
+    def update_progress(self, job_id: str, stage: str, progress: float, result: Optional[Dict], lease_seconds: float) -> None:
+        """Record a finished stage (and its partial results) and renew the lease."""
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, result = ?, locked_until = ?, updated_at = ? WHERE id = ?",
+                (stage, progress, orjson.dumps(result).decode() if result else None, now + lease_seconds, now, job_id)
+            )
+
+    def complete(self, job_id: str, result: Dict) -> None:
+        now = time.time()
+        with self.lock:
+            # The input is no longer needed once every stage has run
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = 1, result = ?, payload = NULL, "
+                "locked_until = NULL, updated_at = ? WHERE id = ?",
+                (DONE, DONE, orjson.dumps(result).decode(), now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool, delay: float = 0.0) -> None:
+        """Mark a job failed, or queue it again to be claimed no sooner than `delay` seconds from now."""
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, locked_until = NULL, not_before = ?, updated_at = ? WHERE id = ?",
+                (QUEUED if retry else FAILED, error, now + delay if retry and delay > 0 else None, now, job_id)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    return JobQueue(settings.JOBS_DB_PATH or data_path("jobs.db"))
+
+def public_job(job: Dict) -> Dict:
+    """Job fields safe to return to clients (no payload, no lease bookkeeping)."""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "filename": job.get("filename"),
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": round(job["progress"], 3),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
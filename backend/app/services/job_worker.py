@@ -0,0 +1,163 @@
+"""Workers that run queued document jobs through the extract -> summarize -> questions pipeline.
+
+Workers run inside the API process (JOB_WORKERS > 0) or separately:
+
+    python -m app.services.job_worker --workers 2
+"""
+import argparse
+import asyncio
+import io
+import logging
+from typing import Dict, Optional
+
+from PIL import Image
+
+from app.core.executor import run_blocking
+from app.core.logging_config import setup_logging
+from app.core.settings import get_settings
+from app.services.job_queue import JobQueue, get_job_queue
+from app.services.ocr_service import OCRService
+from app.services.openrouter_service import get_openrouter_service
+from app.services.pdf_service import PDFService
+from app.services.resilience import UpstreamUnavailableError
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("pdf", "image", "text")
+
+# (stage, progress once the stage is done)
+PIPELINE = [
+    ("extract", 0.4),
+    ("summary", 0.7),
+    ("questions", 1.0),
+]
+
+class JobError(Exception):
+    """A job that cannot succeed on retry (bad input)."""
+
+def retry_delay(error: Exception, attempts: int) -> float:
+    """Seconds before a failed job may be claimed again."""
+    # An upstream that says when to come back knows better than our backoff
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after:
+        return retry_after
+    return settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+
+async def extract_text(kind: str, payload: bytes) -> str:
+    if kind == "pdf":
+        pdf_reader = await run_blocking(PDFService.read_pdf, payload)
+        if len(pdf_reader.pages) > settings.JOB_MAX_PDF_PAGES:
+            raise JobError(f"PDF must be less than {settings.JOB_MAX_PDF_PAGES} pages")
+        return (await run_blocking(PDFService.extract_text, pdf_reader)).strip()
+    if kind == "image":
+        image = Image.open(io.BytesIO(payload))
+        return await OCRService.extract_text(image)
+    if kind == "text":
+        return payload.decode("utf-8")
+    raise JobError(f"Unknown job kind: {kind}")
+
+async def run_job(queue: JobQueue, job: Dict) -> None:
+    """Run the remaining pipeline stages, persisting each stage's output as it completes.
+
+    A retried job resumes after its last completed stage instead of redoing
+    the OCR/extraction and upstream calls it already paid for.
+    """
+    result = dict(job["result"] or {})
+    openrouter_service = get_openrouter_service()
+
+    for stage, progress in PIPELINE:
+        if stage in result:
+            continue
+        if stage == "extract":
+            text = await extract_text(job["kind"], job["payload"])
+            if not text:
+                raise JobError("No text could be extracted from the document")
+            result["extract"] = text
+        elif stage == "summary":
+            result["summary"] = await openrouter_service.generate_summary(result["extract"])
+        elif stage == "questions":
+            result["questions"] = await openrouter_service.generate_questions(result["extract"])
+        await run_blocking(queue.update_progress, job["id"], stage, progress, result, settings.JOB_LEASE_SECONDS)
+
+    await run_blocking(queue.complete, job["id"], result)
+
+class LeaseLost(Exception):
+    """Another worker reclaimed the job; this one must stop working on it."""
+
+async def _keep_lease(queue: JobQueue, job: Dict) -> None:
+    # A single OCR or upstream stage can outlast the lease; renew it while the stage runs
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        if not await run_blocking(queue.renew, job["id"], job["attempts"], settings.JOB_LEASE_SECONDS):
+            raise LeaseLost(f"Lease on job {job['id']} was lost")
+
+async def run_leased(queue: JobQueue, job: Dict) -> None:
+    """run_job with a heartbeat renewing the lease; raises LeaseLost if the renewal fails."""
+    work = asyncio.ensure_future(run_job(queue, job))
+    heartbeat = asyncio.ensure_future(_keep_lease(queue, job))
+    try:
+        await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        if not work.done():
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            heartbeat.result()
+        work.result()
+    finally:
+        work.cancel()
+        heartbeat.cancel()
+
+async def worker_loop(worker_id: int, queue: Optional[JobQueue] = None, stop: Optional[asyncio.Event] = None) -> None:
+    queue = queue or get_job_queue()
+    stop = stop or asyncio.Event()
+    logger.info("Job worker %d started", worker_id)
+
+    while not stop.is_set():
+        job = await run_blocking(queue.claim, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await run_leased(queue, job)
+            logger.info("Job %s done", job["id"], extra={"fields": {"kind": job["kind"], "attempts": job["attempts"]}})
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back for the next worker
+            await run_blocking(queue.fail, job["id"], "worker stopped", True)
+            raise
+        except LeaseLost as e:
+            # The job now belongs to whoever reclaimed it; leave its state alone
+            logger.warning("%s; dropping it", e)
+        except JobError as e:
+            logger.warning("Job %s failed: %s", job["id"], e)
+            await run_blocking(queue.fail, job["id"], str(e), False)
+        except Exception as e:
+            retry = isinstance(e, UpstreamUnavailableError) and job["attempts"] < settings.JOB_MAX_ATTEMPTS
+            delay = retry_delay(e, job["attempts"]) if retry else 0.0
+            logger.error("Job %s failed (attempt %d, retry=%s, delay=%.1fs): %s", job["id"], job["attempts"], retry, delay, e)
+            await run_blocking(queue.fail, job["id"], str(e), retry, delay)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(1, settings.JOB_WORKERS))
+    args = parser.parse_args()
+
+    setup_logging(settings)
+
+    async def run():
+        stop = asyncio.Event()
+        try:
+            await asyncio.gather(*(worker_loop(i, stop=stop) for i in range(args.workers)))
+        finally:
+            await get_openrouter_service().close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
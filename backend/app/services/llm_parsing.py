@@ -0,0 +1,115 @@
+import orjson
+from typing import Any, Dict, Iterable, List, Optional
+
+SSE_DATA_PREFIX = b"data:"
+SSE_DONE = b"[DONE]"
+
+def extract_message_content(data: Dict) -> str:
+    """Pull the assistant message out of a parsed chat completion body."""
+    if 'error' in data:
+        error = data['error']
+        message = error.get('message', 'Unknown error') if isinstance(error, dict) else str(error)
+        raise Exception(f"OpenRouter API error: {message}")
+    if not data.get('choices'):
+        raise Exception("No choices in API response")
+    return data['choices'][0]['message']['content'] or ""
+
+def parse_completion_body(body: bytes) -> str:
+    """Parse a full (non-streamed) chat completion body straight from bytes."""
+    return extract_message_content(orjson.loads(body))
+
+def parse_sse_line(line: bytes) -> Optional[str]:
+    """Return the content delta carried by one streamed SSE line, if any.
+
+    Comment lines (OpenRouter sends ": OPENROUTER PROCESSING" keep-alives),
+    blank lines and the final [DONE] marker yield None.
+    """
+    line = line.strip()
+    if not line.startswith(SSE_DATA_PREFIX):
+        return None
+    data = line[len(SSE_DATA_PREFIX):].strip()
+    if not data or data == SSE_DONE:
+        return None
+    chunk = orjson.loads(data)
+    if 'error' in chunk:
+        extract_message_content(chunk)
+    choices = chunk.get('choices') or []
+    if not choices:
+        return None
+    return (choices[0].get('delta') or {}).get('content')
+
+def parse_json_content(content: str) -> Optional[Any]:
+    """Parse JSON from model output, tolerating code fences and surrounding prose."""
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    # Fall back to the outermost object or array in the text
+    for opening, closing in (("{", "}"), ("[", "]")):
+        start, end = text.find(opening), text.rfind(closing)
+        if start != -1 and end > start:
+            try:
+                return orjson.loads(text[start:end + 1])
+            except orjson.JSONDecodeError:
+                continue
+    return None
+
+def parse_questions(content: str) -> List[str]:
+    """Extract questions from a JSON answer or, failing that, one-per-line text."""
+    parsed = parse_json_content(content)
+    if isinstance(parsed, dict):
+        parsed = parsed.get("questions")
+    if isinstance(parsed, list):
+        return [str(q).strip() for q in parsed if isinstance(q, str) and '?' in q]
+
+    # Parse questions and remove any numbering
+    questions = []
+    for line in content.split('\n'):
+        line = line.strip()
+        line = line.lstrip('0123456789.)[]-• ')
+        line = line.strip()
+        if line and '?' in line:
+            questions.append(line)
+    return questions
+
+def merge_unique(existing: List[str], new_items: Iterable[str]) -> List[str]:
+    """Append items that are not already present (case-insensitive)."""
+    seen = {item.strip().lower() for item in existing}
+    merged = list(existing)
+    for item in new_items:
+        if not isinstance(item, str):
+            continue
+        key = item.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            merged.append(item.strip())
+    return merged
+
+def string_list_schema(name: str, counts: Dict[str, int]) -> Dict:
+    """response_format asking for an object of string arrays with the given sizes."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    key: {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "minItems": count,
+                        "maxItems": count
+                    }
+                    for key, count in counts.items()
+                },
+                "required": list(counts),
+                "additionalProperties": False
+            }
+        }
+    }
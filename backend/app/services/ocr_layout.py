@@ -0,0 +1,134 @@
+"""Cheap script and layout detection run before OCR.
+
+Tesseract needs to be told the language model and the page segmentation
+mode up front; guessing wrong means garbage out, and trying several models
+per image is slow. The pre-pass works on a thresholded copy of the image
+(dark text on a light background) shrunk to LAYOUT_WIDTH, using ink
+projection profiles only:
+
+- Orientation: horizontal text leaves blank rows between lines, vertical
+  text leaves blank columns between columns. Only Japanese is set
+  vertically, so vertical text goes to jpn_vert.
+- Script: Latin letters put most of a line's ink in the x-height band
+  between the baseline and the top of the lowercase letters. Kana and
+  kanji fill their whole square, so the ink is spread over the line height.
+
+When neither signal is clear (photos, tiny text) the caller can fall back
+to tesseract's orientation and script detection.
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+LAYOUT_WIDTH = 1600
+
+# Share of a line's ink inside its densest band of BAND_SHARE of the line height
+BAND_SHARE = 0.45
+LATIN_MIN_CONCENTRATION = 0.65
+CJK_MAX_CONCENTRATION = 0.62
+
+# Lines shorter than this (in pixels at LAYOUT_WIDTH) are too small to judge
+MIN_LINE_HEIGHT = 12
+
+# Tesseract page segmentation modes
+PSM_AUTO = 3
+PSM_VERTICAL_BLOCK = 5
+PSM_BLOCK = 6
+PSM_SINGLE_LINE = 7
+PSM_SPARSE = 11
+
+class OCRLayout(NamedTuple):
+    lang: str
+    psm: int
+    # What decided it: "latin", "cjk", "vertical" or "unknown"
+    reason: str
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) ranges where mask is True."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+def _text_mask(profile: np.ndarray) -> np.ndarray:
+    # Ignore specks: a row/column counts as text when it holds a little ink
+    return profile > max(1, profile.max() * 0.02)
+
+def _band_concentration(line: np.ndarray) -> float:
+    """Largest share of the line's ink found in any band of BAND_SHARE of its height."""
+    profile = line.sum(axis=1).astype(np.float64)
+    total = profile.sum()
+    if total == 0:
+        return 0.0
+    band = max(1, int(round(len(profile) * BAND_SHARE)))
+    sums = np.convolve(profile, np.ones(band), mode="valid")
+    return float(sums.max() / total)
+
+def detect_layout(binary: np.ndarray) -> Optional[OCRLayout]:
+    """Pick the tesseract language and page segmentation mode for a thresholded image.
+
+    Returns None when there is no text to judge, and reason "unknown" with
+    the English model when the script is unclear.
+    """
+    height, width = binary.shape[:2]
+    if width > LAYOUT_WIDTH:
+        scale = LAYOUT_WIDTH / width
+        binary = cv2.resize(binary, (LAYOUT_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    ink = binary < 128
+
+    rows = ink.sum(axis=1)
+    cols = ink.sum(axis=0)
+    if not rows.any():
+        return None
+    # Crop to the inked area so margins don't count as gaps
+    row_runs = _runs(_text_mask(rows))
+    col_runs = _runs(_text_mask(cols))
+    top, bottom = row_runs[0][0], row_runs[-1][1]
+    left, right = col_runs[0][0], col_runs[-1][1]
+    ink = ink[top:bottom, left:right]
+    rows, cols = rows[top:bottom], cols[left:right]
+    row_text, col_text = _text_mask(rows), _text_mask(cols)
+    row_runs, col_runs = _runs(row_text), _runs(col_text)
+
+    blank_rows = 1 - row_text.mean()
+    blank_cols = 1 - col_text.mean()
+    box_height, box_width = ink.shape
+
+    vertical = (
+        # Several columns, each broken into characters (a lone horizontal line has one row run)
+        len(col_runs) >= 2 and len(row_runs) >= 2 and blank_cols > 1.5 * blank_rows and blank_cols > 0.15
+    ) or (
+        # A single vertical column: tall, narrow and broken into characters
+        len(col_runs) == 1 and box_height > 4 * box_width and len(row_runs) >= 4
+    )
+    if vertical:
+        return OCRLayout("jpn_vert", PSM_VERTICAL_BLOCK, "vertical")
+
+    heights = np.array([end - start for start, end in row_runs])
+    lines = [(start, end) for start, end in row_runs if end - start >= MIN_LINE_HEIGHT]
+    concentration = None
+    if lines:
+        concentrations = np.array([_band_concentration(ink[start:end]) for start, end in lines])
+        # Weight by line height so captions and page numbers count less
+        concentration = float(np.average(concentrations, weights=[end - start for start, end in lines]))
+
+    gutter = max((start - end for (_, end), (start, _) in zip(col_runs, col_runs[1:])), default=0)
+    if len(row_runs) == 1:
+        psm = PSM_SINGLE_LINE
+    elif blank_rows > 0.75:
+        # Scattered labels (diagrams, flashcards): find text wherever it is
+        psm = PSM_SPARSE
+    elif gutter > 2 * np.median(heights):
+        # Several text columns: let tesseract find the blocks instead of reading across
+        psm = PSM_AUTO
+    else:
+        psm = PSM_BLOCK
+
+    if concentration is None:
+        # Text too small to judge the script
+        return OCRLayout("eng", psm, "unknown")
+    if concentration >= LATIN_MIN_CONCENTRATION:
+        return OCRLayout("eng", psm, "latin")
+    if concentration <= CJK_MAX_CONCENTRATION:
+        return OCRLayout("jpn", psm, "cjk")
+    return OCRLayout("eng", psm, "unknown")
@@ -1,56 +1,212 @@
 import cv2
 import numpy as np
 import pytesseract
+import shutil
+import threading
+from functools import lru_cache
 from PIL import Image
+from typing import Dict, FrozenSet, Optional
+from app.core.deadline import DeadlineExceeded, RequestCancelled, check, remaining
+from app.core.executor import run_blocking
+from app.core.metrics import span
+from app.core.settings import get_settings
+from app.services.ocr_layout import PSM_AUTO, PSM_BLOCK, OCRLayout, detect_layout
 import logging
 
-logging.basicConfig(level=logging.INFO)
+try:
+    import tesserocr
+except ImportError:  # no tesseract headers to build against; pytesseract starts the CLI (and reloads the model) per image
+    tesserocr = None
+
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Scripts reported by tesseract's orientation and script detection that the jpn model reads
+JAPANESE_SCRIPTS = {"Japanese", "Han", "Hiragana", "Katakana"}
+
+@lru_cache()
+def tesseract_available() -> bool:
+    """Whether this host can run OCR at all (tesserocr or the tesseract binary)."""
+    return tesserocr is not None or shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+@lru_cache()
+def get_languages() -> FrozenSet[str]:
+    """Installed tesseract language models (asking tesseract costs a process start)."""
+    try:
+        if tesserocr is not None:
+            return frozenset(tesserocr.get_languages()[1])
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception as e:
+        logger.warning("Could not list tesseract languages: %s", e)
+        return frozenset({settings.OCR_DEFAULT_LANGUAGE})
+
+@lru_cache()
+def _installed(lang: str) -> str:
+    """lang, or the closest installed model (warns once per language)."""
+    installed = get_languages()
+    if lang in installed:
+        return lang
+    # Horizontal Japanese still beats English on vertical Japanese text
+    fallback = "jpn" if lang == "jpn_vert" and "jpn" in installed else settings.OCR_DEFAULT_LANGUAGE
+    logger.warning("Tesseract language %s is not installed, using %s", lang, fallback)
+    return fallback
+
+def _timeout() -> float:
+    check("ocr_tesseract")
+    left = remaining()
+    # pytesseract treats 0 as "no timeout"; check() above guarantees left > 0 here
+    return left if left is not None else 0
+
+def _detect_script(image) -> str:
+    """Fallback when the layout pre-pass can't tell: tesseract's script detection (--psm 0)."""
+    if "osd" not in get_languages():
+        return settings.OCR_DEFAULT_LANGUAGE
+    try:
+        with span("ocr_osd"):
+            osd = pytesseract.image_to_osd(image, config="--psm 0", timeout=_timeout(), output_type=pytesseract.Output.DICT)
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():
+            raise DeadlineExceeded("Request deadline exceeded during ocr_osd")
+        # Too little text for detection
+        return settings.OCR_DEFAULT_LANGUAGE
+    except pytesseract.TesseractError:
+        return settings.OCR_DEFAULT_LANGUAGE
+    return "jpn" if osd.get("script") in JAPANESE_SCRIPTS else settings.OCR_DEFAULT_LANGUAGE
+
+def choose_layout(binary: np.ndarray) -> OCRLayout:
+    """Language model and page segmentation mode for a thresholded image."""
+    if not settings.OCR_AUTO_LANGUAGE:
+        return OCRLayout(settings.OCR_DEFAULT_LANGUAGE, PSM_BLOCK, "configured")
+    if binary.mean() < 128:
+        # Mostly dark: light text on a dark background
+        binary = 255 - binary
+    with span("ocr_detect"):
+        layout = detect_layout(binary)
+    if layout is None:
+        return OCRLayout(settings.OCR_DEFAULT_LANGUAGE, PSM_AUTO, "unknown")
+    if layout.reason == "unknown":
+        layout = layout._replace(lang=_detect_script(binary))
+    return layout._replace(lang=_installed(layout.lang))
+
+class _Engines(threading.local):
+    """One tesserocr engine per language and executor thread; loading a model takes longer than a page."""
+
+    def __init__(self):
+        self.by_lang: Dict[str, "tesserocr.PyTessBaseAPI"] = {}
+
+    def get(self, lang: str) -> "tesserocr.PyTessBaseAPI":
+        engine = self.by_lang.get(lang)
+        if engine is None:
+            with span("ocr_engine_init"):
+                engine = tesserocr.PyTessBaseAPI(lang=lang)
+                engine.SetVariable("preserve_interword_spaces", "1")
+            self.by_lang[lang] = engine
+        return engine
+
+_engines = _Engines()
+
+def warm_up_engine(lang: Optional[str] = None) -> str:
+    """Load the language model ahead of the first image (only tesserocr keeps it loaded).
+
+    Returns the language actually used once missing models are substituted.
+    """
+    lang = _installed(lang or settings.OCR_DEFAULT_LANGUAGE)
+    if tesserocr is not None:
+        _engines.get(lang)
+    return lang
+
+def recognize(image, layout: OCRLayout) -> str:
+    """OCR an image with the layout's model, killed when the request deadline passes."""
+    if tesserocr is not None:
+        timeout = _timeout()
+        engine = _engines.get(layout.lang)
+        engine.SetPageSegMode(layout.psm)
+        engine.SetImage(image if isinstance(image, Image.Image) else Image.fromarray(image))
+        try:
+            # Tesseract's own deadline (ms, 0 = none) stops a slow page like pytesseract's kill does
+            if not engine.Recognize(timeout=int(timeout * 1000)):
+                raise DeadlineExceeded("Request deadline exceeded during ocr_tesseract")
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+    try:
+        return pytesseract.image_to_string(
+            image,
+            lang=layout.lang,
+            config=f"--oem 3 --psm {layout.psm} -c preserve_interword_spaces=1",
+            timeout=_timeout()
+        )
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():
+            raise DeadlineExceeded("Request deadline exceeded during ocr_tesseract")
+        raise
+
 class OCRService:
     @staticmethod
     async def extract_text(image: Image.Image) -> str:
         try:
+            # OpenCV and tesseract block, so keep them off the event loop
+            return await run_blocking(OCRService._extract_text_sync, image)
+        except (DeadlineExceeded, RequestCancelled):
+            raise
+        except Exception as e:
+            logger.error("OCR processing failed: %s", e)
+            raise Exception(f"OCR processing failed: {str(e)}")
+
+    @staticmethod
+    def detect_layout(image: Image.Image) -> OCRLayout:
+        """Layout of an unprocessed image (grayscale + Otsu only)."""
+        gray = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return choose_layout(binary)
+
+    @staticmethod
+    def _extract_text_sync(image: Image.Image) -> str:
+        with span("ocr_resize"):
             # Convert PIL Image to cv2 format
             img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
+
             # Resize image if too large (helps with speed)
             height, width = img_cv.shape[:2]
             if width > 2000:
                 scale = 2000 / width
                 img_cv = cv2.resize(img_cv, None, fx=scale, fy=scale)
 
+        check("ocr_grayscale")
+        with span("ocr_grayscale"):
             # Convert to grayscale
             gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-            
+
+        check("ocr_denoise")
+        with span("ocr_denoise"):
             # Denoise
             denoised = cv2.fastNlMeansDenoising(gray)
-            
+
+        check("ocr_contrast")
+        with span("ocr_contrast"):
             # Increase contrast
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
             enhanced = clahe.apply(denoised)
-            
+
+        check("ocr_threshold")
+        with span("ocr_threshold"):
             # Threshold
             _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-            # OCR Configuration
-            custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
-            
+        check("ocr_detect")
+        # Pick eng / jpn / jpn_vert and the segmentation mode once, instead of retrying models
+        layout = choose_layout(binary)
+        logger.debug("OCR layout", extra={"fields": layout._asdict()})
+
+        with span("ocr_tesseract"):
             # Extract text
-            extracted_text = pytesseract.image_to_string(
-                binary,
-                config=custom_config,
-                lang='eng'  # Specify English language
-            )
-            
-            # Clean up text
-            cleaned_text = ' '.join(line.strip() for line in extracted_text.splitlines() if line.strip())
-            
-            if not cleaned_text:
-                return "No text could be extracted from the image"
-                
-            return cleaned_text
-            
-        except Exception as e:
-            logger.error(f"OCR processing failed: {str(e)}")
-            raise Exception(f"OCR processing failed: {str(e)}") 
\ No newline at end of file
+            extracted_text = recognize(binary, layout)
+
+        # Clean up text; Japanese has no spaces between words, so don't add any at line breaks
+        separator = "" if layout.lang.startswith("jpn") else " "
+        cleaned_text = separator.join(line.strip() for line in extracted_text.splitlines() if line.strip())
+
+        if not cleaned_text:
+            return "No text could be extracted from the image"
+
+        return cleaned_text
@@ -1,14 +1,37 @@
 import aiohttp
 from app.core.settings import get_settings
-import json
+from app.services.resilience import UpstreamUnavailableError, get_upstream_guard
+from app.services.routing import get_model_router
+from app.services.llm_parsing import (
+    merge_unique,
+    parse_completion_body,
+    parse_json_content,
+    parse_questions,
+    parse_sse_line,
+    string_list_schema,
+)
+from app.core.deadline import check
+from app.core.logging_config import log_payload
+from app.core.executor import run_blocking
+from app.core.metrics import observe_stage, record_cache, span
+from app.services.similarity_cache import get_similarity_cache
+from app.services.prompts import MERGE_SUMMARIES, QUESTIONS, SEGMENT_SUMMARY, SUMMARY, PromptTemplate, encode_payload
+from functools import lru_cache
+import asyncio
+import logging
+import time
 import tiktoken  # Add this import for token counting
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Add constants at the top of the file
 MAX_TOKENS = 16000  # Leave some buffer for the response
 MAX_FILE_SIZE_MB = 5
+QUESTION_COUNT = 5
+WORDS_PER_CATEGORY = 10
+WORD_CATEGORIES = ["easy", "medium", "hard"]
 ENCODING = tiktoken.encoding_for_model("gpt-3.5-turbo")
 
 class OpenRouterService:
@@ -18,181 +41,343 @@ class OpenRouterService:
             raise ValueError("OPENROUTER_API_KEY environment variable is not set")
             
         self.model = settings.OPENROUTER_MODEL
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = settings.OPENROUTER_BASE_URL
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "HTTP-Referer": "http://localhost:8000",
             "X-Title": "EduLingo",
             "Content-Type": "application/json"
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Reuse one session (and its connection pool) across requests."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=settings.OPENROUTER_MAX_CONCURRENCY)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def prime(self, connections: int = 1) -> int:
+        """Open pooled connections (DNS, TCP and TLS) before the first real request.
+
+        Each GET of the model list leaves a keep-alive connection in the pool.
+        Returns the status of the last response.
+        """
+        session = await self._get_session()
+
+        async def fetch() -> int:
+            async with session.get(f"{self.base_url}/models") as response:
+                await response.read()
+                return response.status
+
+        statuses = await asyncio.gather(*(fetch() for _ in range(max(1, connections))))
+        return statuses[-1]
+
+    async def warm_up_inference(self) -> str:
+        """One-token completion through the full request path (guard, routing, parsing)."""
+        payload = {
+            "messages": [{"role": "user", "content": "Reply with OK."}],
+            "temperature": 0,
+            "max_tokens": 1,
+            "stream": False
+        }
+        return await self._complete(payload, "summary")
+
+    async def _send(self, body: bytes, stream: bool, model: str, first_byte: Optional[asyncio.Event] = None) -> tuple[int, str]:
+        """POST one encoded chat completion body for `model` through the upstream guard.
+
+        Returns (status, message content) on success and (status, error body) otherwise.
+        """
+        session = await self._get_session()
+        router = get_model_router()
+
+        async def send():
+            started = time.monotonic()
+            # Already JSON; the session headers carry the content type
+            async with session.post(f"{self.base_url}/chat/completions", data=body) as response:
+                # Headers are in, so this is the upstream's time to first byte
+                waited = time.monotonic() - started
+                router.latency.record(model, waited)
+                observe_stage("upstream_wait", waited)
+                if first_byte is not None:
+                    first_byte.set()
+                if response.status != 200:
+                    return response.status, response.headers.get("Retry-After"), await response.text()
+                if stream:
+                    # Parse SSE chunks as they arrive instead of buffering the whole body
+                    parts = []
+                    parse_seconds = 0.0
+                    async for line in response.content:
+                        parse_started = time.perf_counter()
+                        delta = parse_sse_line(line)
+                        parse_seconds += time.perf_counter() - parse_started
+                        if delta:
+                            if not parts:
+                                observe_stage("first_token", time.monotonic() - started)
+                            parts.append(delta)
+                    observe_stage("response_parse", parse_seconds)
+                    return 200, None, "".join(parts)
+                response_body = await response.read()
+                observe_stage("upstream_total", time.monotonic() - started)
+                with span("response_parse"):
+                    return 200, None, parse_completion_body(response_body)
+
+        return await get_upstream_guard().call(send)
+
+    async def _send_hedged(self, body: bytes, stream: bool, model: str) -> tuple[int, str]:
+        """Send to `model`; if it is slower than its observed p95, race a backup request."""
+        router = get_model_router()
+        delay = router.hedge_delay(model)
+        if delay is None:
+            return await self._send(body, stream, model)
+
+        first_byte = asyncio.Event()
+        primary = asyncio.create_task(self._send(body, stream, model, first_byte))
+        waiter = asyncio.create_task(first_byte.wait())
+        done, _ = await asyncio.wait({primary, waiter}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if done or not router.try_acquire_hedge():
+            return await primary
+
+        backup = asyncio.create_task(self._send(body, stream, model))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            router.counters["hedges_won"] += 1
+                        return task.result()
+            # Both attempts failed; report the primary's error
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if not task.done():
+                    task.cancel()
+
+    async def _post_chat(self, payload: Dict, endpoint: str) -> tuple[int, str]:
+        """Route a chat completion to the endpoint's models, falling back down the list."""
+        router = get_model_router()
+        router.counters["calls"] += 1
+        models = router.models_for(endpoint)
+
+        for index, model in enumerate(models):
+            # Covers top-ups and fallbacks too: don't start another call for an abandoned request
+            check(f"{endpoint} request")
+            try:
+                # Serialized once per model; retries and hedges reuse the same bytes
+                return await self._send_hedged(encode_payload(payload, model), payload["stream"], model)
+            except UpstreamUnavailableError:
+                if index == len(models) - 1:
+                    raise
+                router.counters["fallbacks"] += 1
+                logger.warning("Model %s unavailable, falling back to %s", model, models[index + 1])
+
+    async def _complete(self, payload: Dict, endpoint: str) -> str:
+        """Run a chat completion and return the assistant's message content."""
+        status, response_text = await self._post_chat(payload, endpoint)
+        if status != 200:
+            logger.warning("OpenRouter API error response", extra={"fields": {"status": status, "endpoint": endpoint}})
+            log_payload(logger, "OpenRouter API error body", response_text, endpoint=endpoint)
+            raise Exception(f"OpenRouter API error: {response_text}")
+        return response_text
+
+    def _cache_kind(self, kind: str, template: PromptTemplate) -> str:
+        """Cache namespace: results from another model chain or prompt version are never reused."""
+        models = ",".join(get_model_router().models_for(kind))
+        return f"{kind}:{models}:{template.version}"
+
+    async def _cached(self, kind: str, template: PromptTemplate, text: str):
+        """Result stored for a near-duplicate of text, or None."""
+        if not settings.SIMILARITY_CACHE_ENABLED or len(text) < settings.SIMILARITY_MIN_CHARS:
+            return None
+        hit = await run_blocking(get_similarity_cache().lookup, self._cache_kind(kind, template), text)
+        record_cache(f"near_duplicate_{kind}", hit=hit is not None)
+        if hit is None:
+            return None
+        value, similarity = hit
+        logger.info("Near-duplicate %s cache hit", kind, extra={"fields": {"similarity": round(similarity, 3)}})
+        return value
+
+    async def _remember(self, kind: str, template: PromptTemplate, text: str, value) -> None:
+        if settings.SIMILARITY_CACHE_ENABLED and len(text) >= settings.SIMILARITY_MIN_CHARS:
+            await run_blocking(get_similarity_cache().store, self._cache_kind(kind, template), text, value)
 
     def count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text."""
-        return len(ENCODING.encode(text))
+        with span("tokenize"):
+            return len(ENCODING.encode(text))
 
     def truncate_text(self, text: str, max_tokens: int) -> str:
         """Truncate text to fit within token limit."""
-        tokens = ENCODING.encode(text)
+        # A token is at least one UTF-8 byte, so short texts fit without encoding them
+        if len(text) * 4 <= max_tokens:
+            return text
+        with span("tokenize"):
+            tokens = ENCODING.encode(text)
         if len(tokens) <= max_tokens:
             return text
         return ENCODING.decode(tokens[:max_tokens]) + "\n\n[Text truncated due to length...]"
 
-    async def generate_summary(self, text: str) -> str:
+    async def generate_summary(self, text: str, reuse_similar: bool = True) -> str:
         try:
-            # Check token count and truncate if necessary
-            if self.count_tokens(text) > MAX_TOKENS:
-                text = self.truncate_text(text, MAX_TOKENS)
-                print(f"Text truncated to {self.count_tokens(text)} tokens")
-
-            prompt = (
-                "You are a helpful AI assistant. Please provide a clear and concise summary "
-                f"of the following text:\n\n{text}\n\nSummary:"
-            )
-            
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 500,
-                "stream": False
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    response_text = await response.text()
-                    print(f"API Response for summary: {response_text}")
-                    
-                    if response.status != 200:
-                        print(f"OpenRouter API error response: {response_text}")
-                        raise Exception(f"OpenRouter API error: {response_text}")
-                    
-                    data = json.loads(response_text)
-                    if not data.get('choices'):
-                        raise Exception("No choices in API response")
-                        
-                    return data['choices'][0]['message']['content'].strip()
+            # Edited notes pass reuse_similar=False: a small edit must not return the old result
+            cached = await self._cached("summary", SUMMARY, text) if reuse_similar else None
+            if cached is not None:
+                return cached
+            original = text
+
+            # Truncate if necessary (encodes the text once)
+            text = self.truncate_text(text, MAX_TOKENS)
+            if text is not original:
+                logger.info("Text truncated to %d tokens", MAX_TOKENS)
+
+            payload = SUMMARY.payload(text, settings.OPENROUTER_STREAM)
+            summary = await self._complete(payload, "summary")
+            log_payload(logger, "API response for summary", summary, endpoint="summary")
+            summary = summary.strip()
+            await self._remember("summary", SUMMARY, original, summary)
+            return summary
 
         except Exception as e:
-            print(f"Error in generate_summary: {str(e)}")
+            logger.error("Error in generate_summary: %s", e)
             raise e
 
-    async def generate_questions(self, text: str) -> list[str]:
+    async def summarize_segment(self, text: str) -> str:
+        """Short partial summary of one section of a longer document."""
         try:
-            # Check token count and truncate if necessary
-            if self.count_tokens(text) > MAX_TOKENS:
-                text = self.truncate_text(text, MAX_TOKENS)
-                print(f"Text truncated to {self.count_tokens(text)} tokens")
-
-            prompt = (
-                "You are a helpful AI assistant. Generate 5 study questions based on "
-                "this text. Questions should test understanding and critical thinking. "
-                "Do not number the questions, just list them with each on a new line.\n\n"
-                f"Text: {text}\n\nQuestions (make sure each ends with a question mark):"
-            )
+            payload = SEGMENT_SUMMARY.payload(self.truncate_text(text, MAX_TOKENS), settings.OPENROUTER_STREAM)
+            summary = await self._complete(payload, "summary")
+            log_payload(logger, "API response for section summary", summary, endpoint="summary")
+            return summary.strip()
+
+        except Exception as e:
+            logger.error("Error in summarize_segment: %s", e)
+            raise e
+
+    async def merge_summaries(self, summaries: List[str]) -> str:
+        """Combine partial summaries of consecutive sections into one summary."""
+        try:
+            joined = "\n\n".join(f"Section {i + 1}: {summary}" for i, summary in enumerate(summaries))
+            sections = self.truncate_text(joined, MAX_TOKENS)
+            if sections is not joined:
+                logger.info("Partial summaries truncated to %d tokens", MAX_TOKENS)
+
+            payload = MERGE_SUMMARIES.payload(sections, settings.OPENROUTER_STREAM)
+            summary = await self._complete(payload, "summary")
+            log_payload(logger, "API response for merged summary", summary, endpoint="summary", sections=len(summaries))
+            return summary.strip()
+
+        except Exception as e:
+            logger.error("Error in merge_summaries: %s", e)
+            raise e
+
+    async def generate_questions(self, text: str, reuse_similar: bool = True) -> list[str]:
+        try:
+            # Edited notes pass reuse_similar=False: a small edit must not return the old result
+            cached = await self._cached("questions", QUESTIONS, text) if reuse_similar else None
+            if cached is not None:
+                return cached
+            original = text
+
+            # Truncate if necessary (encodes the text once)
+            text = self.truncate_text(text, MAX_TOKENS)
+            if text is not original:
+                logger.info("Text truncated to %d tokens", MAX_TOKENS)
+
+            questions = await self._request_questions(text, QUESTION_COUNT, [])
+            log_payload(logger, "Extracted questions", questions, endpoint="questions", count=len(questions))
+
+            # Ask only for the missing questions instead of padding right away
+            for _ in range(settings.LLM_TOPUP_ATTEMPTS):
+                if len(questions) >= QUESTION_COUNT:
+                    break
+                missing = QUESTION_COUNT - len(questions)
+                logger.info("Requesting %d more questions", missing)
+                questions = merge_unique(questions, await self._request_questions(text, missing, questions))
+
+            if len(questions) >= QUESTION_COUNT:
+                # Padded fallbacks are not worth serving to the next near-duplicate
+                await self._remember("questions", QUESTIONS, original, questions[:QUESTION_COUNT])
+
+            # Ensure we have exactly 5 questions
+            while len(questions) < QUESTION_COUNT:
+                questions.append("What other aspects of this text would you like to explore?")
             
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.8,
-                "max_tokens": 500,
-                "stream": False
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    response_text = await response.text()
-                    print(f"API Response for questions: {response_text}")
-                    
-                    if response.status != 200:
-                        print(f"OpenRouter API error response: {response_text}")
-                        raise Exception(f"OpenRouter API error: {response_text}")
-                    
-                    data = json.loads(response_text)
-                    print(f"Parsed data: {data}")
-                    
-                    if not data.get('choices'):
-                        raise Exception(f"No choices in API response. Full response: {data}")
-                    
-                    response_text = data['choices'][0]['message']['content']
-                    
-                    # Parse questions and remove any numbering
-                    questions = []
-                    for line in response_text.split('\n'):
-                        line = line.strip()
-                        line = line.lstrip('0123456789.)[]-• ')
-                        line = line.strip()
-                        if line and '?' in line:
-                            questions.append(line)
-                    
-                    print(f"Extracted questions: {questions}")
-                    
-                    # Ensure we have exactly 5 questions
-                    while len(questions) < 5:
-                        questions.append("What other aspects of this text would you like to explore?")
-                    
-                    return questions[:5]
+            return questions[:QUESTION_COUNT]
 
         except Exception as e:
-            print(f"Error in generate_questions: {str(e)}")
+            logger.error("Error in generate_questions: %s", e)
             raise e 
 
-    async def generate_word_sets(self, prompt: str) -> Dict[str, List[str]]:
+    async def _request_questions(self, text: str, count: int, existing: List[str]) -> List[str]:
+        # Top-ups only change the tail, so they share the prefix (instructions + text) with the first call
+        avoid = "Do not repeat any of these questions:\n" + "\n".join(existing) + "\n\n" if existing else ""
+        payload = QUESTIONS.payload(text, settings.OPENROUTER_STREAM, count=count, avoid=avoid)
+        if settings.OPENROUTER_STRUCTURED_OUTPUT:
+            payload["response_format"] = string_list_schema("study_questions", {"questions": count})
+
+        content = await self._complete(payload, "questions")
+        return merge_unique([], parse_questions(content))
+
+    async def generate_word_sets(self, prompt: str, categories: List[str] = WORD_CATEGORIES) -> Dict[str, List[str]]:
         try:
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.9,
-                "max_tokens": 300,
-                "stream": False
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    response_text = await response.text()
-                    data = json.loads(response_text)
-                    
-                    # Check for error in response
-                    if 'error' in data:
-                        error_msg = data['error'].get('message', 'Unknown error')
-                        print(f"OpenRouter API error: {error_msg}")  # Log the detailed error
-                        raise Exception("Internal server error")
-                    
-                    if response.status != 200 or not data.get('choices'):
-                        print(f"No choices in response. Full response: {data}")
-                        raise Exception("Internal server error")
-                    
-                    content = data['choices'][0]['message']['content']
-                    try:
-                        word_sets = json.loads(content)
-                    except json.JSONDecodeError:
-                        word_sets = self._parse_word_response(content)
-                    
-                    # Validate word count but don't use default words
-                    for category in ["easy", "medium", "hard"]:
-                        current_words = word_sets.get(category, [])
-                        if len(current_words) > 10:
-                            word_sets[category] = current_words[:10]
-                        elif len(current_words) < 10:
-                            raise Exception(f"Not enough words generated for {category} category")
-
-                    return word_sets
+            word_sets = await self._request_words(prompt, {c: WORDS_PER_CATEGORY for c in categories})
+
+            # Top up short categories with follow-up requests for just the missing words
+            for _ in range(settings.LLM_TOPUP_ATTEMPTS):
+                short = {c: WORDS_PER_CATEGORY - len(word_sets[c]) for c in categories if len(word_sets[c]) < WORDS_PER_CATEGORY}
+                if not short:
+                    break
+                logger.info("Requesting more words", extra={"fields": {"missing": short}})
+                topup_prompt = (
+                    "Generate a JSON object with arrays of additional English words for language learning:\n"
+                    + "\n".join(
+                        f'"{c}": {n} more {c}-level words, different from: {", ".join(word_sets[c]) or "none"}'
+                        for c, n in short.items()
+                    )
+                )
+                extra = await self._request_words(topup_prompt, short)
+                for category in short:
+                    word_sets[category] = merge_unique(word_sets[category], extra[category])
+
+            # Validate word count but don't use default words
+            for category in categories:
+                current_words = word_sets[category]
+                if len(current_words) > WORDS_PER_CATEGORY:
+                    word_sets[category] = current_words[:WORDS_PER_CATEGORY]
+                elif len(current_words) < WORDS_PER_CATEGORY:
+                    raise Exception(f"Not enough words generated for {category} category")
+
+            return word_sets
 
         except Exception as e:
-            print(f"Error generating word sets: {str(e)}")
+            logger.error("Error generating word sets: %s", e)
             raise e
 
+    async def _request_words(self, prompt: str, counts: Dict[str, int]) -> Dict[str, List[str]]:
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.9,
+            "max_tokens": 300,
+            "stream": settings.OPENROUTER_STREAM
+        }
+        if settings.OPENROUTER_STRUCTURED_OUTPUT:
+            payload["response_format"] = string_list_schema("word_sets", counts)
+
+        content = await self._complete(payload, "words")
+        parsed = parse_json_content(content)
+        if not isinstance(parsed, dict):
+            parsed = self._parse_word_response(content)
+        return {c: merge_unique([], parsed.get(c) or []) for c in counts}
+
     def _parse_word_response(self, content: str) -> Dict[str, List[str]]:
         """Fallback method to parse non-JSON responses"""
         result = {"easy": [], "medium": [], "hard": []}
@@ -216,4 +401,9 @@ class OpenRouterService:
         for category in result:
             result[category] = result[category][:10]
         
-        return result 
\ No newline at end of file
+        return result
+
+@lru_cache()
+def get_openrouter_service() -> OpenRouterService:
+    """Shared service instance so every route uses the same connection pool."""
+    return OpenRouterService()
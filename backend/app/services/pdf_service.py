@@ -1,12 +1,101 @@
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from PyPDF2 import PdfReader, PdfWriter
+from app.core.deadline import check
+from app.core.executor import run_blocking
+from app.core.metrics import span
+from app.core.settings import get_settings
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from typing import AsyncIterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+import asyncio
+import logging
+import multiprocessing
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Batch export settings
+STREAM_CHUNK_SIZE = 64 * 1024  # 64KB per streamed chunk
+
+_batch_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_batch_executor() -> ProcessPoolExecutor:
+    """Lazily create the process pool so importing this module stays cheap."""
+    global _batch_executor
+    if _batch_executor is None:
+        # spawn, not fork: by now this process runs the logging listener and executor
+        # threads, and a forked child could inherit one of their locks held
+        _batch_executor = ProcessPoolExecutor(
+            max_workers=max(1, settings.PDF_BATCH_WORKERS),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _batch_executor
+
+def shutdown_batch_executor() -> None:
+    global _batch_executor
+    if _batch_executor is not None:
+        _batch_executor.shutdown(wait=False, cancel_futures=True)
+        _batch_executor = None
+
+def _render_note(title: str, content: str, note_type: str) -> bytes:
+    """Render a single note in a worker process (reportlab holds the GIL)."""
+    return PDFService.generate_pdf(title, content, note_type).getvalue()
+
+class _ChunkWriter:
+    """File-like sink that hands PDF bytes to the event loop as they are written."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.position = 0
+        self.pending = bytearray()
+        # Set when the client is gone, so the merge thread stops instead of writing to nobody
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise IOError("Batch PDF stream closed")
+        self.pending += data
+        self.position += len(data)
+        if len(self.pending) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        if self.pending:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, bytes(self.pending))
+            self.pending = bytearray()
 
 class PDFService:
+    @staticmethod
+    def read_pdf(content: bytes) -> PdfReader:
+        with span("pdf_open"):
+            return PdfReader(BytesIO(content))
+
+    @staticmethod
+    def extract_text(pdf_reader: PdfReader) -> str:
+        """Extract and join the text of every page."""
+        with span("pdf_page_extraction"):
+            text = ""
+            for page in pdf_reader.pages:
+                # Large scans take a while per page; stop once the request is gone
+                check("pdf_page_extraction")
+                text += page.extract_text()
+            return text
+
     @staticmethod
     def generate_pdf(title: str, content: str, note_type: str = "General Notes") -> BytesIO:
+        with span("pdf_render"):
+            return PDFService._generate_pdf(title, content, note_type)
+
+    @staticmethod
+    def _generate_pdf(title: str, content: str, note_type: str) -> BytesIO:
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
         styles = getSampleStyleSheet()
@@ -29,15 +118,122 @@ class PDFService:
         
         # Build PDF content
         elements = []
-        elements.append(Paragraph(title, title_style))
-        elements.append(Paragraph(f"Type: {note_type}", styles["Italic"]))
+        # Paragraph parses its text as markup; notes are plain text, so escape &, < and >
+        elements.append(Paragraph(escape(title), title_style))
+        elements.append(Paragraph(f"Type: {escape(note_type)}", styles["Italic"]))
         elements.append(Spacer(1, 12))
 
         # Format content with proper line breaks
-        formatted_content = content.replace('\n', '<br/>')  # Convert newlines to HTML breaks
+        formatted_content = escape(content).replace('\n', '<br/>')  # Convert newlines to HTML breaks
         elements.append(Paragraph(formatted_content, content_style))
         
         # Generate PDF
         doc.build(elements)
         buffer.seek(0)
-        return buffer 
\ No newline at end of file
+        return buffer
+
+    @staticmethod
+    def generate_toc(title: str, entries: List[Tuple[str, str, int]]) -> BytesIO:
+        """Render a table of contents; entries are (title, note_type, start page)."""
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        styles = getSampleStyleSheet()
+
+        entry_style = ParagraphStyle(
+            'TOCEntry',
+            parent=styles['Normal'],
+            fontSize=12,
+            spaceAfter=8,
+            leading=16
+        )
+
+        elements = []
+        elements.append(Paragraph(escape(title), styles['Heading1']))
+        elements.append(Paragraph("Table of Contents", styles['Heading2']))
+        elements.append(Spacer(1, 12))
+        for index, (note_title, note_type, page) in enumerate(entries, start=1):
+            elements.append(Paragraph(
+                f"{index}. {escape(note_title)} <i>({escape(note_type)})</i> ........ page {page}",
+                entry_style
+            ))
+
+        doc.build(elements)
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def merge_notes(title: str, notes: List[Tuple[str, str]], rendered: List[bytes], stream) -> None:
+        """Merge rendered notes behind a table of contents and write them to `stream`.
+
+        `notes` holds (title, note_type) pairs in the same order as `rendered`.
+        """
+        readers = [PdfReader(BytesIO(pdf_bytes)) for pdf_bytes in rendered]
+        page_counts = [len(reader.pages) for reader in readers]
+
+        # The TOC length shifts every start page, so re-render until it is stable
+        toc_pages = 1
+        while True:
+            entries = []
+            page = toc_pages + 1
+            for (note_title, note_type), count in zip(notes, page_counts):
+                entries.append((note_title, note_type, page))
+                page += count
+            toc = PdfReader(PDFService.generate_toc(title, entries))
+            if len(toc.pages) == toc_pages:
+                break
+            toc_pages = len(toc.pages)
+
+        with span("pdf_merge"):
+            writer = PdfWriter()
+            writer.append(toc, outline_item="Table of Contents")
+            for (note_title, _), reader in zip(notes, readers):
+                writer.append(reader, outline_item=note_title)
+            writer.write(stream)
+
+    async def render_batch(self, notes: List[Tuple[str, str, str]]) -> List[bytes]:
+        """Render (title, note_type, content) notes to PDF bytes in parallel worker processes."""
+        loop = asyncio.get_running_loop()
+        executor = _get_batch_executor()
+        return list(await asyncio.gather(*(
+            loop.run_in_executor(executor, _render_note, note_title, content, note_type)
+            for note_title, note_type, content in notes
+        )))
+
+    async def stream_batch_pdf(self, title: str, notes: List[Tuple[str, str]], rendered: List[bytes]) -> AsyncIterator[bytes]:
+        """Stream rendered notes merged behind a table of contents.
+
+        `notes` holds (title, note_type) pairs in the same order as `rendered`
+        (from render_batch, called before the response starts so rendering
+        errors can still become an error response).
+        """
+        loop = asyncio.get_running_loop()
+
+        # Merge in a thread and forward bytes to the client while the writer runs
+        queue: asyncio.Queue = asyncio.Queue()
+        sink = _ChunkWriter(loop, queue)
+
+        def write_merged():
+            try:
+                PDFService.merge_notes(title, notes, rendered, sink)
+                sink.flush()
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        merge_task = asyncio.ensure_future(run_blocking(write_merged))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+            try:
+                await merge_task
+            except Exception:
+                # Headers are already sent; raising aborts the chunked body, so the client
+                # sees an incomplete download rather than a clean end to a truncated PDF
+                logger.exception("Batch PDF merge failed after streaming started")
+                raise
+        finally:
+            # Client disconnected (generator closed) or merge failed: stop the writer
+            sink.closed = True
+            merge_task.cancel()
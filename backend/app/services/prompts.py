@@ -0,0 +1,83 @@
+"""Chat prompts as precompiled templates, and request bodies serialized once.
+
+Each template keeps its instructions in a constant system message sent
+first, so every request for the same task starts with identical tokens and
+upstream prompt caching can reuse them. The note text follows as its own
+message, passed through as-is instead of being copied into an f-string.
+Per-call details (question counts, questions to avoid) come last, so
+top-up requests for the same text share the whole prefix through the text.
+
+Bodies are serialized by orjson directly to bytes, once per model, rather
+than through json.dumps to a str and then encoded (aiohttp's json=).
+"""
+import hashlib
+from typing import Dict, List
+
+import orjson
+
+class PromptTemplate:
+    def __init__(self, instructions: str, tail: str, temperature: float, max_tokens: int):
+        self.system = {"role": "system", "content": instructions}
+        self.tail = tail
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Changes with the wording or generation settings; cached results key on it
+        self.version = hashlib.blake2b(
+            orjson.dumps([instructions, tail, temperature, max_tokens]), digest_size=6
+        ).hexdigest()
+
+    def messages(self, text: str, **params) -> List[Dict]:
+        return [
+            self.system,
+            {"role": "user", "content": text},
+            {"role": "user", "content": self.tail.format(**params) if params else self.tail},
+        ]
+
+    def payload(self, text: str, stream: bool, **params) -> Dict:
+        return {
+            "messages": self.messages(text, **params),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+
+SUMMARY = PromptTemplate(
+    "You are a helpful AI assistant. Please provide a clear and concise summary "
+    "of the text in the next message.",
+    "Summary:",
+    temperature=0.7,
+    max_tokens=500,
+)
+
+# Partial summaries only feed MERGE_SUMMARIES (and the question prompt), so they stay short
+SEGMENT_SUMMARY = PromptTemplate(
+    "You are a helpful AI assistant. The next message is one section of a longer document. "
+    "Summarize it in a few sentences, keeping its key terms, names and numbers.",
+    "Section summary:",
+    temperature=0.3,
+    max_tokens=200,
+)
+
+MERGE_SUMMARIES = PromptTemplate(
+    "You are a helpful AI assistant. The next message holds summaries of consecutive "
+    "sections of one document. Combine them into a single clear and concise summary "
+    "of the whole document.",
+    "Summary:",
+    temperature=0.7,
+    max_tokens=500,
+)
+
+QUESTIONS = PromptTemplate(
+    "You are a helpful AI assistant. Generate study questions based on the text in the "
+    "next message. Questions should test understanding and critical thinking. "
+    'Respond with a JSON object of the form {"questions": ["..."]}; '
+    "each question must end with a question mark.",
+    "{avoid}Generate {count} questions.\n\nQuestions:",
+    temperature=0.8,
+    max_tokens=500,
+)
+
+def encode_payload(payload: Dict, model: str) -> bytes:
+    """Serialize a chat payload for `model` straight to UTF-8 JSON bytes."""
+    # Shallow copy: the messages (and the note inside them) are not duplicated
+    return orjson.dumps({"model": model, **payload})
@@ -1,8 +1,11 @@
 from transformers import pipeline
+import logging
 import re
 from typing import Dict, List
 import torch
 
+logger = logging.getLogger(__name__)
+
 class QuestionGeneratorService:
     def __init__(self):
         # Initialize the question generation pipeline
@@ -102,7 +105,7 @@ class QuestionGeneratorService:
             }
 
         except Exception as e:
-            print(f"Error generating questions: {str(e)}")
+            logger.error("Error generating questions: %s", e)
             return self._empty_response()
 
     def _empty_response(self):
@@ -0,0 +1,339 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+from app.core.deadline import DeadlineExceeded, check, clamp_timeout
+from app.core.settings import get_settings
+from app.core.storage import connect, data_path
+
+# Upstream statuses worth retrying: rate limited or transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class UpstreamUnavailableError(Exception):
+    """Raised when the upstream cannot be reached right now (circuit open, retries exhausted)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Async token bucket limiting how fast calls may start."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+class SharedTokenBucket:
+    """Token bucket stored in SQLite so every worker process draws from one budget.
+
+    Same interface as TokenBucket; used when the API runs as several
+    processes (gunicorn) that share one upstream rate limit.
+    """
+
+    def __init__(self, path: str, name: str, rate_per_second: float, capacity: float):
+        self.name = name
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.connection = connect(path)
+        self.lock = threading.Lock()
+        # Own thread for the SQLite round-trips: behind OCR/PDF work in the shared
+        # executor, every upstream call would wait for a rate-limit check.
+        # Started on first use so no thread exists when gunicorn forks the workers.
+        self.executor: Optional[ThreadPoolExecutor] = None
+        with self.lock:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, capacity, time.time())
+            )
+
+    def _refilled(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait for one."""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute(
+                    "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                now = time.time()
+                tokens = self._refilled(row["tokens"], row["updated_at"], now)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                self.connection.execute(
+                    "UPDATE token_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+                    (tokens, now, self.name)
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self) -> None:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-bucket")
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = await loop.run_in_executor(self.executor, self._take)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    @property
+    def available(self) -> float:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+        return self._refilled(row["tokens"], row["updated_at"], time.time())
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures, half-open probe after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def before_call(self) -> bool:
+        """Raise while the circuit rejects calls; True if this call is the half-open probe."""
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise UpstreamUnavailableError("Upstream circuit is open", retry_after=remaining)
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                raise UpstreamUnavailableError(
+                    "Upstream circuit is half-open, probe in flight",
+                    retry_after=self.reset_timeout
+                )
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+class UpstreamGuard:
+    """Concurrency cap, rate limit, timeout, retries and circuit breaker around upstream calls."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate_per_minute: float,
+        timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        breaker: CircuitBreaker,
+        shared_state_path: Optional[str] = None
+    ):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        # Allow bursts of up to one concurrency window
+        if shared_state_path:
+            self.bucket = SharedTokenBucket(shared_state_path, "openrouter", rate_per_minute / 60.0, max(1, max_concurrency))
+        else:
+            self.bucket = TokenBucket(rate_per_minute / 60.0, max(1, max_concurrency))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self.in_flight = 0
+        self.counters: Dict[str, int] = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "connection_errors": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "rejected": 0,
+            "exhausted": 0,
+        }
+
+    @classmethod
+    def from_settings(cls, settings) -> "UpstreamGuard":
+        return cls(
+            max_concurrency=settings.OPENROUTER_MAX_CONCURRENCY,
+            rate_per_minute=settings.OPENROUTER_RATE_LIMIT_PER_MINUTE,
+            timeout=settings.OPENROUTER_TIMEOUT_SECONDS,
+            max_retries=settings.OPENROUTER_MAX_RETRIES,
+            backoff_base=settings.OPENROUTER_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.OPENROUTER_BACKOFF_MAX_SECONDS,
+            breaker=CircuitBreaker(
+                settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                settings.CIRCUIT_BREAKER_RESET_SECONDS
+            ),
+            shared_state_path=(settings.SHARED_STATE_PATH or data_path("shared_state.db"))
+            if settings.OPENROUTER_SHARED_RATE_LIMIT else None
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, send: Callable[[], Awaitable[Tuple[int, Optional[str], str]]]) -> Tuple[int, str]:
+        """Run `send` under the guard.
+
+        `send` performs one HTTP attempt and returns (status, Retry-After header, body).
+        Non-retryable responses are returned as-is so callers keep their own error handling.
+        """
+        self.counters["calls"] += 1
+        last_error = "unknown error"
+        retry_after = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                probe = self.breaker.before_call()
+            except UpstreamUnavailableError:
+                self.counters["rejected"] += 1
+                raise
+
+            delay = None
+            async with self.semaphore:
+                await self.bucket.acquire()
+                self.in_flight += 1
+                self.counters["attempts"] += 1
+                try:
+                    # Waiting for a slot or a token may have used up the request's budget
+                    check("upstream call")
+                    timeout = clamp_timeout(self.timeout)
+                    status, retry_after_header, body = await asyncio.wait_for(send(), timeout)
+                except asyncio.TimeoutError:
+                    self.counters["timeouts"] += 1
+                    if timeout < self.timeout:
+                        # Our deadline, not the upstream's fault: keep the breaker out of it
+                        raise DeadlineExceeded("Request deadline exceeded waiting for OpenRouter")
+                    self.breaker.record_failure()
+                    last_error = f"timed out after {self.timeout}s"
+                except (aiohttp.ClientError, ConnectionError) as e:
+                    self.counters["connection_errors"] += 1
+                    self.breaker.record_failure()
+                    last_error = f"connection error: {str(e)}"
+                else:
+                    if status not in RETRYABLE_STATUSES:
+                        self.breaker.record_success()
+                        return status, body
+                    if status == 429:
+                        # Throttling means the upstream is alive; don't trip the breaker
+                        self.counters["throttled"] += 1
+                    else:
+                        self.counters["server_errors"] += 1
+                        self.breaker.record_failure()
+                    last_error = f"status {status}"
+                    retry_after = parse_retry_after(retry_after_header)
+                    delay = retry_after
+                finally:
+                    self.in_flight -= 1
+                    # Parse errors and cancellations (e.g. losing a hedge) must not wedge a half-open probe,
+                    # but only the probe itself may clear the flag: an older call finishing must not let a second probe in
+                    if probe:
+                        self.breaker.probe_in_flight = False
+
+            if attempt == self.max_retries:
+                break
+            if delay is None:
+                delay = self.backoff(attempt)
+            elif delay > self.backoff_max:
+                # Waiting this long would hold the request open; fail fast instead
+                break
+            if clamp_timeout(delay) < delay:
+                # The retry could not finish before the request deadline
+                break
+            self.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+        self.counters["exhausted"] += 1
+        raise UpstreamUnavailableError(
+            f"OpenRouter API unavailable: {last_error}",
+            retry_after=retry_after if retry_after is not None else self.breaker.reset_timeout
+        )
+
+    def metrics(self) -> Dict:
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_open": int(self.breaker.state == CircuitBreaker.OPEN),
+            "circuit_consecutive_failures": self.breaker.failures,
+            "circuit_times_opened": self.breaker.times_opened,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_tokens_available": round(self.bucket.available, 2),
+            **self.counters,
+        }
+
+@lru_cache()
+def get_upstream_guard() -> UpstreamGuard:
+    return UpstreamGuard.from_settings(get_settings())
@@ -0,0 +1,97 @@
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional
+
+from app.core.settings import get_settings
+
+# Number of recent first-byte latencies kept per model
+LATENCY_WINDOW = 200
+
+class LatencyTracker:
+    """Sliding window of first-byte latencies per model."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, model: str, seconds: float) -> None:
+        self.samples[model].append(seconds)
+
+    def quantile(self, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        samples = self.samples.get(model)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+class ModelRouter:
+    """Pick models per endpoint and decide when a hedged backup request is worth firing."""
+
+    def __init__(self, settings):
+        self.default_model = settings.OPENROUTER_MODEL
+        self.fallback_models = list(settings.OPENROUTER_FALLBACK_MODELS)
+        self.endpoint_models = {
+            "summary": settings.OPENROUTER_SUMMARY_MODEL,
+            "questions": settings.OPENROUTER_QUESTIONS_MODEL,
+            "words": settings.OPENROUTER_WORDS_MODEL,
+        }
+        self.hedge_enabled = settings.HEDGE_ENABLED
+        self.hedge_quantile = settings.HEDGE_QUANTILE
+        self.hedge_min_delay = settings.HEDGE_MIN_DELAY_SECONDS
+        self.hedge_max_ratio = settings.HEDGE_MAX_RATIO
+        self.hedge_min_samples = settings.HEDGE_MIN_SAMPLES
+        self.latency = LatencyTracker()
+        self.counters: Dict[str, int] = {
+            "calls": 0,
+            "fallbacks": 0,
+            "hedges_fired": 0,
+            "hedges_won": 0,
+            "hedges_skipped_budget": 0,
+        }
+
+    def models_for(self, endpoint: str) -> List[str]:
+        """Ordered list of models to try: endpoint choice first, then the fallbacks."""
+        primary = self.endpoint_models.get(endpoint) or self.default_model
+        models = [primary]
+        for model in self.fallback_models:
+            if model not in models:
+                models.append(model)
+        return models
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """How long to wait for the primary's first byte before hedging, or None to never hedge."""
+        if not self.hedge_enabled:
+            return None
+        observed = self.latency.quantile(model, self.hedge_quantile, self.hedge_min_samples)
+        if observed is None:
+            # Not enough data to know what "slow" means for this model yet
+            return None
+        return max(self.hedge_min_delay, observed)
+
+    def try_acquire_hedge(self) -> bool:
+        """Keep hedges under HEDGE_MAX_RATIO of all calls so extra spend stays capped."""
+        if self.counters["hedges_fired"] + 1 > self.hedge_max_ratio * max(1, self.counters["calls"]):
+            self.counters["hedges_skipped_budget"] += 1
+            return False
+        self.counters["hedges_fired"] += 1
+        return True
+
+    def metrics(self) -> Dict:
+        models = {}
+        for model in self.latency.samples:
+            models[model] = {
+                "samples": len(self.latency.samples[model]),
+                "first_byte_p50": self.latency.quantile(model, 0.5),
+                "first_byte_p95": self.latency.quantile(model, 0.95),
+                "first_byte_p99": self.latency.quantile(model, 0.99),
+            }
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_max_ratio": self.hedge_max_ratio,
+            "models": models,
+            **self.counters,
+        }
+
+@lru_cache()
+def get_model_router() -> ModelRouter:
+    return ModelRouter(get_settings())
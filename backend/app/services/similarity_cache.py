@@ -0,0 +1,145 @@
+"""Near-duplicate cache for LLM results keyed by MinHash signatures.
+
+The same textbook page OCR'd twice rarely produces identical text, so an
+exact hash misses. Texts are reduced to character shingles (robust to
+typos and whitespace), signed with MinHash and indexed with LSH bands in
+SQLite. A lookup is a handful of indexed queries plus a vectorized
+signature comparison on the few candidates.
+"""
+import hashlib
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from app.core.settings import get_settings
+from app.core.storage import connect, data_path
+
+settings = get_settings()
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: pairs above ~0.65 similarity almost always share a bucket
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+CHUNK = 4096  # shingles hashed per step, bounds the temporary (CHUNK x NUM_PERM) matrix
+
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+
+NON_WORD = re.compile(r"[\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, band, bucket, entry_id)
+) WITHOUT ROWID;
+-- Eviction deletes by entry_id, which is last in the primary key
+CREATE INDEX IF NOT EXISTS bands_entry_id ON bands (entry_id);
+"""
+
+def normalize(text: str) -> str:
+    return " ".join(NON_WORD.sub(" ", text.lower()).split())
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) over character shingles."""
+    text = normalize(text)
+    if len(text) < SHINGLE_SIZE:
+        text = text.ljust(SHINGLE_SIZE)
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    minimum = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNK):
+        chunk = hashes[start:start + CHUNK, None]
+        permuted = (chunk * _A + _B) % PRIME
+        np.minimum(minimum, permuted.min(axis=0), out=minimum)
+    return minimum.astype(np.uint32)
+
+def band_buckets(sig: np.ndarray):
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest()
+        yield band, int.from_bytes(digest, "big", signed=True)
+
+class SimilarityCache:
+    """Persistent MinHash/LSH index from text to a cached result, per kind ("summary", "questions")."""
+
+    def __init__(self, path: str, threshold: float, max_entries: int):
+        self.connection = connect(path)
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+
+    def lookup(self, kind: str, text: str) -> Optional[Tuple[Any, float]]:
+        """Best cached value whose estimated Jaccard similarity is at least the threshold."""
+        sig = signature(text)
+        buckets = list(band_buckets(sig))
+        values = ", ".join("(?, ?)" for _ in buckets)
+        params = [value for pair in buckets for value in pair] + [kind]
+        with self.lock:
+            # Joining against a VALUES list keeps every band probe on the primary key
+            rows = self.connection.execute(
+                f"SELECT id, signature, value FROM entries WHERE id IN ("
+                f"SELECT bands.entry_id FROM (VALUES {values}) AS probe "
+                f"JOIN bands ON bands.band = probe.column1 AND bands.bucket = probe.column2 AND bands.kind = ?)",
+                params
+            ).fetchall()
+        if not rows:
+            return None
+
+        candidates = np.frombuffer(b"".join(row["signature"] for row in rows), dtype=np.uint32).reshape(len(rows), NUM_PERM)
+        similarity = (candidates == sig).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] < self.threshold:
+            return None
+        return orjson.loads(rows[best]["value"]), float(similarity[best])
+
+    def store(self, kind: str, text: str, value: Any) -> None:
+        sig = signature(text)
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                entry_id = self.connection.execute(
+                    "INSERT INTO entries (kind, signature, value, created_at) VALUES (?, ?, ?, ?)",
+                    (kind, sig.tobytes(), orjson.dumps(value).decode(), now)
+                ).lastrowid
+                self.connection.executemany(
+                    "INSERT INTO bands (kind, band, bucket, entry_id) VALUES (?, ?, ?, ?)",
+                    [(kind, band, bucket, entry_id) for band, bucket in band_buckets(sig)]
+                )
+                # Drop the oldest entries once over the cap (ids grow with insertion time)
+                cutoff = entry_id - self.max_entries
+                if cutoff > 0 and entry_id % 100 == 0:
+                    self.connection.execute("DELETE FROM bands WHERE entry_id <= ?", (cutoff,))
+                    self.connection.execute("DELETE FROM entries WHERE id <= ?", (cutoff,))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+@lru_cache()
+def get_similarity_cache() -> SimilarityCache:
+    return SimilarityCache(
+        settings.SIMILARITY_CACHE_PATH or data_path("similarity.db"),
+        settings.SIMILARITY_THRESHOLD,
+        settings.SIMILARITY_CACHE_MAX_ENTRIES
+    )
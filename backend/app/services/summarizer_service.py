@@ -1,9 +1,11 @@
 from transformers import pipeline
 from app.core.settings import get_settings
+import logging
 import re
 from typing import Dict, List, Optional
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 class SummarizerService:
     def __init__(self):
@@ -70,7 +72,7 @@ class SummarizerService:
                 "foreign_terms": terms if terms else None
             }
         except Exception as e:
-            print(f"Error in summarization: {str(e)}")
+            logger.error("Error in summarization: %s", e)
             return {
                 "summary": "Failed to generate summary",
                 "note_type": "general",
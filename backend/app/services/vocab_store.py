@@ -0,0 +1,191 @@
+"""Read-only JLPT vocabulary served straight from a memory-mapped file.
+
+The file is built by web/scripts/process_jp_words.py. Opening it only maps
+the file and reads the section directory, so there is nothing to parse at
+startup and forked workers share the pages. Layout (little endian):
+
+    MAGIC "JLPTVOC1", u32 section count, (name[8], u64 offset, u64 length)...
+
+Sections are arrays: a deduplicated UTF-8 string table (strofs/strings),
+string ids per record (word/furi/romaji/meaning), the level per record
+(records are sorted by level, lvlrng holds each level's range), record ids
+sorted by romaji and kana for prefix search, and meaning keywords with
+postings lists.
+"""
+import itertools
+import mmap
+import random
+import struct
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.settings import get_settings
+from app.core.storage import data_path
+
+settings = get_settings()
+
+MAGIC = b"JLPTVOC1"
+
+SECTION_DTYPES = {
+    "strofs": "<u4",
+    "strings": "u1",
+    "word": "<u4",
+    "furi": "<u4",
+    "romaji": "<u4",
+    "meaning": "<u4",
+    "level": "u1",
+    "lvlrng": "<u4",
+    "byromaji": "<u4",
+    "bykana": "<u4",
+    "kwterms": "<u4",
+    "kwofs": "<u4",
+    "kwpost": "<u4",
+}
+
+# Same difficulty buckets as the word lists: N5 easy, N4-N3 medium, N2-N1 hard
+CATEGORY_LEVELS = {
+    "easy": [5],
+    "medium": [4, 3],
+    "hard": [2, 1],
+}
+
+class VocabStoreError(Exception):
+    """The vocabulary file is missing or not in the expected format."""
+
+def _lower_bound(count: int, key_at: Callable[[int], str], prefix: str) -> int:
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(middle) < prefix:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+class VocabStore:
+    def __init__(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise VocabStoreError(f"Cannot open vocabulary store {path}: {e}")
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise VocabStoreError(f"{path} is not a vocabulary store")
+
+        (count,) = struct.unpack_from("<I", self.buffer, len(MAGIC))
+        self.sections: Dict[str, np.ndarray] = {}
+        for index in range(count):
+            name, offset, length = struct.unpack_from("<8sQQ", self.buffer, len(MAGIC) + 4 + index * 24)
+            name = name.rstrip(b"\0").decode()
+            if name == "strings":
+                self.strings_offset = offset
+            if name in SECTION_DTYPES:
+                dtype = np.dtype(SECTION_DTYPES[name])
+                self.sections[name] = np.frombuffer(self.buffer, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+        missing = set(SECTION_DTYPES) - set(self.sections)
+        if missing:
+            raise VocabStoreError(f"{path} is missing sections: {', '.join(sorted(missing))}")
+
+        self.size = len(self.sections["level"])
+
+    def string(self, string_id: int) -> str:
+        offsets = self.sections["strofs"]
+        start = self.strings_offset + int(offsets[string_id])
+        end = self.strings_offset + int(offsets[string_id + 1])
+        return self.buffer[start:end].decode("utf-8")
+
+    def word(self, index: int) -> Dict:
+        return {
+            "word": self.string(self.sections["word"][index]),
+            "furigana": self.string(self.sections["furi"][index]),
+            "romaji": self.string(self.sections["romaji"][index]),
+            "meaning": self.string(self.sections["meaning"][index]),
+            "level": int(self.sections["level"][index]),
+        }
+
+    def level_range(self, level: int) -> range:
+        ranges = self.sections["lvlrng"]
+        if not 0 <= level < len(ranges) // 2:
+            return range(0)
+        return range(int(ranges[2 * level]), int(ranges[2 * level + 1]))
+
+    def counts(self) -> Dict[str, int]:
+        return {f"N{level}": len(self.level_range(level)) for level in range(1, 6)}
+
+    def random_words(self, levels: List[int], count: int) -> List[Dict]:
+        """Sample distinct words from the given levels without touching the rest of the file."""
+        ranges = [self.level_range(level) for level in levels]
+        total = sum(len(r) for r in ranges)
+        picks = []
+        for position in random.sample(range(total), min(count, total)):
+            for r in ranges:
+                if position < len(r):
+                    picks.append(r[position])
+                    break
+                position -= len(r)
+        return [self.word(index) for index in picks]
+
+    def _key(self, column: str, index: int) -> str:
+        if column == "romaji":
+            return self.string(self.sections["romaji"][index]).strip().lower()
+        # Kana key: furigana, or the word itself when it is already kana
+        furigana = self.string(self.sections["furi"][index])
+        return (furigana or self.string(self.sections["word"][index])).strip()
+
+    def _prefix_matches(self, order: np.ndarray, column: str, prefix: str) -> Iterator[int]:
+        start = _lower_bound(len(order), lambda i: self._key(column, order[i]), prefix)
+        for i in range(start, len(order)):
+            if not self._key(column, order[i]).startswith(prefix):
+                return
+            yield int(order[i])
+
+    def search_prefix(self, prefix: str, level: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """Words whose romaji or kana reading starts with prefix (binary search over the sorted indexes)."""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        seen = set()
+        results = []
+        candidates = itertools.chain(
+            self._prefix_matches(self.sections["byromaji"], "romaji", prefix.lower()),
+            self._prefix_matches(self.sections["bykana"], "kana", prefix)
+        )
+        for index in candidates:
+            if index in seen or (level is not None and self.sections["level"][index] != level):
+                continue
+            seen.add(index)
+            results.append(self.word(index))
+            if len(results) >= limit:
+                break
+        return results
+
+    def search_meaning(self, keyword: str, level: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """Words whose English meaning contains the keyword (or a word starting with it)."""
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return []
+        terms = self.sections["kwterms"]
+        offsets = self.sections["kwofs"]
+        postings = self.sections["kwpost"]
+        start = _lower_bound(len(terms), lambda i: self.string(terms[i]), keyword)
+
+        results = []
+        seen = set()
+        for term in range(start, len(terms)):
+            if not self.string(terms[term]).startswith(keyword):
+                break
+            for index in postings[offsets[term]:offsets[term + 1]]:
+                index = int(index)
+                if index in seen or (level is not None and self.sections["level"][index] != level):
+                    continue
+                seen.add(index)
+                results.append(self.word(index))
+                if len(results) >= limit:
+                    return results
+        return results
+
+@lru_cache()
+def get_vocab_store() -> VocabStore:
+    return VocabStore(settings.VOCAB_STORE_PATH or data_path("words_ja.bin"))
@@ -0,0 +1,147 @@
+"""Startup warm-up behind the /ready probe.
+
+/health answers as soon as the process is up (liveness). /ready only passes
+once the steps in WARMUP_STEPS have run, so a load balancer or autoscaler
+does not send a new instance traffic that would pay for the cold path:
+
+- upstream: DNS, TCP and TLS to OpenRouter, leaving pooled keep-alive
+  connections (plus a 1-token completion with WARMUP_DUMMY_INFERENCE)
+- ocr: with tesserocr, the language models loaded on every executor thread
+  (engines are per thread); then one small image through the full OCR
+  pipeline
+
+Steps run concurrently and each one is timed and reported. If the ocr step
+fails or times out, the instance stays not ready: it would fail the same
+way on real requests. On hosts without tesseract the step is skipped, so
+the text endpoints still come up. The upstream step is reported but does
+not hold readiness back (an upstream outage must not take every instance
+out of rotation; the circuit breaker handles that).
+"""
+import asyncio
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from PIL import Image, ImageDraw
+
+from app.core.executor import run_blocking
+from app.core.settings import get_settings
+from app.services.ocr_service import OCRService, tesseract_available, tesserocr, warm_up_engine
+from app.services.openrouter_service import get_openrouter_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Models the layout pre-pass can pick
+OCR_LANGUAGES = ("eng", "jpn", "jpn_vert")
+
+class StepSkipped(Exception):
+    """The step does not apply on this host; it neither passes nor blocks readiness."""
+
+async def _warm_upstream() -> Dict:
+    service = get_openrouter_service()
+    result = {"status_code": await service.prime(settings.WARMUP_UPSTREAM_CONNECTIONS)}
+    if settings.WARMUP_DUMMY_INFERENCE:
+        started = time.monotonic()
+        await service.warm_up_inference()
+        result["inference_seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+def _load_engines(barrier: threading.Barrier) -> List[str]:
+    # Missing models resolve to what will really be used
+    languages = sorted({warm_up_engine(lang) for lang in OCR_LANGUAGES})
+    try:
+        # Hold this thread until every task has one, so each lands on a different thread
+        barrier.wait(timeout=5)
+    except threading.BrokenBarrierError:
+        pass
+    return languages
+
+def _warm_ocr_sync() -> Dict:
+    image = Image.new("RGB", (400, 60), "white")
+    ImageDraw.Draw(image).text((10, 20), "Warm up the OCR engine", fill="black")
+    started = time.monotonic()
+    OCRService._extract_text_sync(image)
+    return {"inference_seconds": round(time.monotonic() - started, 3)}
+
+async def _warm_ocr() -> Dict:
+    if not tesseract_available():
+        raise StepSkipped("tesseract is not installed")
+    result = {}
+    if tesserocr is not None:
+        threads = settings.EXECUTOR_WORKERS
+        barrier = threading.Barrier(threads)
+        loaded = await asyncio.gather(*(run_blocking(_load_engines, barrier) for _ in range(threads)))
+        result.update(languages=loaded[0], threads=threads)
+    result.update(await run_blocking(_warm_ocr_sync))
+    return result
+
+STEPS: Dict[str, Callable[[], Awaitable[Dict]]] = {
+    "upstream": _warm_upstream,
+    "ocr": _warm_ocr,
+}
+
+# Steps whose failure is reported but still lets the instance become ready
+NON_BLOCKING_STEPS = {"upstream"}
+
+class WarmUp:
+    def __init__(self, steps: List[str], step_timeout: float):
+        unknown = [name for name in steps if name not in STEPS]
+        if unknown:
+            logger.warning("Ignoring unknown warm-up steps: %s", ", ".join(unknown))
+        self.steps = [name for name in steps if name in STEPS]
+        self.step_timeout = step_timeout
+        self.results: Dict[str, Dict] = {name: {"status": "pending"} for name in self.steps}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished is not None and all(
+            result["status"] in ("ok", "skipped")
+            for name, result in self.results.items() if name not in NON_BLOCKING_STEPS
+        )
+
+    async def _run_step(self, name: str) -> None:
+        started = time.monotonic()
+        try:
+            details = await asyncio.wait_for(STEPS[name](), self.step_timeout)
+            self.results[name] = {"status": "ok", **details}
+        except StepSkipped as e:
+            self.results[name] = {"status": "skipped", "reason": str(e)}
+        except asyncio.TimeoutError:
+            self.results[name] = {"status": "timeout"}
+        except Exception as e:
+            self.results[name] = {"status": "failed", "error": str(e)}
+        self.results[name]["seconds"] = round(time.monotonic() - started, 3)
+        logger.info("Warm-up step finished", extra={"fields": {"step": name, **self.results[name]}})
+
+    async def run(self) -> None:
+        self.started = time.monotonic()
+        await asyncio.gather(*(self._run_step(name) for name in self.steps))
+        self.finished = time.monotonic()
+        logger.info("Warm-up finished", extra={"fields": {"seconds": round(self.finished - self.started, 3)}})
+
+    def report(self) -> Dict:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return {
+            "status": "warming_up" if self.finished is None else "ready" if self.ready else "failed",
+            "seconds": round(end - self.started, 3) if self.started is not None else 0.0,
+            "steps": self.results,
+        }
+
+    def metrics(self) -> Dict:
+        values = {"ready": int(self.ready)}
+        if self.finished is not None:
+            values["total_seconds"] = round(self.finished - self.started, 3)
+        for name, result in self.results.items():
+            if "seconds" in result:
+                values[f"{name}_seconds"] = result["seconds"]
+                values[f"{name}_ok"] = int(result["status"] == "ok")
+        return values
+
+@lru_cache()
+def get_warmup() -> WarmUp:
+    return WarmUp(settings.WARMUP_STEPS, settings.WARMUP_STEP_TIMEOUT_SECONDS)
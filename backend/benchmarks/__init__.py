@@ -0,0 +1,2 @@
+# Benchmarks are run as modules from the backend directory, e.g.
+#   python -m benchmarks.bench_logging
@@ -0,0 +1,87 @@
+"""Compare print-based payload logging with the queue-based structured logger.
+
+Simulates many concurrent requests that each "receive" an LLM response and
+log it, the way OpenRouterService used to print every raw response, parsed
+dict and extracted question list. Output goes to a line-buffered file, like
+an unbuffered container stdout, and per-request latency is reported as JSON.
+
+    python -m benchmarks.bench_logging --concurrency 200 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from app.core.logging_config import log_payload, setup_logging, shutdown_logging
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def fake_response(size: int) -> str:
+    content = ("What is the main idea of this paragraph? " * (size // 40))[:size]
+    return json.dumps({"choices": [{"message": {"content": content}}]})
+
+async def run(mode: str, concurrency: int, requests: int, payload_size: int, stream) -> dict:
+    logger = logging.getLogger("app.benchmarks")
+    response_text = fake_response(payload_size)
+    latencies = []
+
+    async def handle():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)  # stand-in for the upstream wait
+        data = json.loads(response_text)
+        if mode == "print":
+            print(f"API Response for questions: {response_text}", file=stream)
+            print(f"Parsed data: {data}", file=stream)
+            print(f"Extracted questions: {data['choices'][0]['message']['content'].split('?')}", file=stream)
+        else:
+            log_payload(logger, "API response for questions", response_text, endpoint="questions")
+            logger.info("Generated questions", extra={"fields": {"count": 5}})
+        latencies.append(time.perf_counter() - started)
+
+    async def client():
+        for _ in range(requests):
+            await handle()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--payload-size", type=int, default=8000)
+    parser.add_argument("--debug", action="store_true", help="run the logger at DEBUG (payload sampling active)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "print.log"), "w", buffering=1) as stream:
+            results.append(asyncio.run(run("print", args.concurrency, args.requests, args.payload_size, stream)))
+        with open(os.path.join(tmp, "structured.log"), "w", buffering=1) as stream:
+            setup_logging(SimpleNamespace(LOG_LEVEL=None, DEBUG=args.debug, LOG_JSON=True), stream=stream)
+            results.append(asyncio.run(run("structured", args.concurrency, args.requests, args.payload_size, stream)))
+            shutdown_logging()
+
+    json.dump({"benchmark": "logging", "args": vars(args), "results": results}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
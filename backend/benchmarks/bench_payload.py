@@ -0,0 +1,110 @@
+"""Allocations and time spent building one OpenRouter request body.
+
+Compares the previous path (prompt f-string around the note, payload dict,
+a copy with the model, then aiohttp's json= which runs json.dumps and
+encodes the result) with the prompt templates and orjson bytes used now.
+Memory is measured with tracemalloc as the peak held at once while building
+the body (the note itself is allocated beforehand and not counted).
+Tokenization is left out; it is the same on both paths.
+
+    python -m benchmarks.bench_payload --chars 64000 --repeat 50
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.services.prompts import QUESTIONS, SUMMARY, encode_payload
+from benchmarks.fixtures import make_text
+
+MODEL = "openai/gpt-3.5-turbo"
+
+def legacy_summary(text: str) -> bytes:
+    prompt = (
+        "You are a helpful AI assistant. Please provide a clear and concise summary "
+        f"of the following text:\n\n{text}\n\nSummary:"
+    )
+    payload = {
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.7,
+        "max_tokens": 500,
+        "stream": False
+    }
+    body = {**payload, "model": MODEL}
+    # What aiohttp's json= does
+    return json.dumps(body).encode("utf-8")
+
+def legacy_questions(text: str) -> bytes:
+    prompt = (
+        "You are a helpful AI assistant. Generate 5 study questions based on "
+        "this text. Questions should test understanding and critical thinking. "
+        'Respond with a JSON object of the form {"questions": ["..."]}; '
+        "each question must end with a question mark.\n\n"
+    )
+    prompt += f"Text: {text}\n\nQuestions:"
+    payload = {
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.8,
+        "max_tokens": 500,
+        "stream": False
+    }
+    body = {**payload, "model": MODEL}
+    return json.dumps(body).encode("utf-8")
+
+def templated_summary(text: str) -> bytes:
+    return encode_payload(SUMMARY.payload(text, False), MODEL)
+
+def templated_questions(text: str) -> bytes:
+    return encode_payload(QUESTIONS.payload(text, False, count=5, avoid=""), MODEL)
+
+def peak_bytes(func, text: str) -> int:
+    """Most memory allocated at once during one call."""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        func(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+def timed(func, text: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=64000, help="note length (~16k tokens of English)")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = {
+        "english": make_text(args.chars),
+        # Non-ASCII notes: json.dumps escapes each character to \\uXXXX, orjson writes UTF-8
+        "japanese": ("日本語の勉強ノートです。漢字と文法を復習します。" * (args.chars // 24 + 1))[:args.chars // 2],
+    }
+    cases = {
+        "summary": (legacy_summary, templated_summary),
+        "questions": (legacy_questions, templated_questions),
+    }
+    for text_name, text in texts.items():
+        for case, (legacy, templated) in cases.items():
+            legacy_peak = peak_bytes(legacy, text)
+            peak = peak_bytes(templated, text)
+            print(json.dumps({
+                "text": text_name,
+                "call": case,
+                "text_chars": len(text),
+                "legacy_body_bytes": len(legacy(text)),
+                "body_bytes": len(templated(text)),
+                "legacy_peak_kb": round(legacy_peak / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+                "peak_reduction": round(1 - peak / legacy_peak, 2),
+                "legacy_us": round(timed(legacy, text, args.repeat), 1),
+                "us": round(timed(templated, text, args.repeat), 1),
+            }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Serialization time and bytes on the wire per endpoint payload.
+
+Renders representative response bodies with the stdlib-based JSONResponse
+(FastAPI's default) and with ORJSONResponse, then compresses the result
+with gzip and brotli (when installed) at the levels CompressionMiddleware
+uses. Prints one JSON object per payload.
+
+    python -m benchmarks.bench_serialization --repeat 200
+"""
+import argparse
+import json
+import time
+import zlib
+
+from starlette.responses import JSONResponse
+
+from app.core.compression import brotli
+from app.core.responses import ORJSONResponse
+from app.core.settings import get_settings
+from benchmarks.fixtures import make_text
+
+settings = get_settings()
+
+def payloads():
+    note = make_text(50000)
+    words = [
+        {"word": "食べる", "furigana": "たべる", "romaji": "taberu", "meaning": "to eat", "level": 5}
+        for _ in range(20)
+    ]
+    routes = [
+        f"APIRoute(path='/api/{name}', name='{name.replace('-', '_')}', methods=['POST'])"
+        for name in ("summarize", "generate-questions", "extract-pdf", "download-pdf", "process-image") * 8
+    ]
+    return {
+        "extract-pdf": {"extracted_text": note},
+        "summarize": {"summary": make_text(1200, 1), "questions": None, "note_type": "general", "foreign_terms": None},
+        "generate-questions": {"summary": None, "questions": [make_text(120, i) + "?" for i in range(5)], "note_type": "general"},
+        "jobs-result": {"job_id": "0" * 32, "extracted_text": note[:20000], "summary": make_text(1200, 2), "questions": [make_text(120, i) for i in range(5)]},
+        "vocab-search": {"status": "success", "data": words},
+        "debug-routes": {"routes": routes},
+    }
+
+def timed(func, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, payload in payloads().items():
+        stdlib_body, stdlib_us = timed(lambda: JSONResponse(payload).body, args.repeat)
+        orjson_body, orjson_us = timed(lambda: ORJSONResponse(payload).body, args.repeat)
+        # Same document either way
+        assert json.loads(stdlib_body) == json.loads(orjson_body)
+
+        def gzip_body():
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            return compressor.compress(orjson_body) + compressor.flush()
+        gzipped, gzip_us = timed(gzip_body, args.repeat)
+
+        result = {
+            "payload": name,
+            "stdlib_render_us": round(stdlib_us, 1),
+            "orjson_render_us": round(orjson_us, 1),
+            "render_speedup": round(stdlib_us / orjson_us, 2),
+            "json_bytes": len(orjson_body),
+            "below_compression_threshold": len(orjson_body) < settings.COMPRESSION_MIN_BYTES,
+            "gzip_bytes": len(gzipped),
+            "gzip_us": round(gzip_us, 1),
+        }
+        if brotli is not None:
+            compressed, brotli_us = timed(
+                lambda: brotli.compress(orjson_body, quality=settings.COMPRESSION_BROTLI_QUALITY), args.repeat
+            )
+            result.update(brotli_bytes=len(compressed), brotli_us=round(brotli_us, 1))
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare two load reports and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits with status 1 when any scenario's p95/p99 latency grows, or its
+throughput (successful requests per second) drops, by more than the
+threshold (percent), or when its error rate rises by more than
+--error-threshold percentage points. The error rate is compared in points
+rather than percent because the baseline is usually zero.
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "rss_max_mb")
+HIGHER_IS_BETTER = ("throughput_rps",)
+GATED = ("p95_ms", "p99_ms", "throughput_rps")
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+def error_rate(report):
+    if report.get("error_rate") is not None:
+        return report["error_rate"]
+    # Reports written before error_rate was recorded
+    if report.get("requests"):
+        return report.get("errors", 0) / report["requests"]
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    parser.add_argument("--error-threshold", type=float, default=1.0, help="allowed error rate increase, in percentage points")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = []
+    rows = []
+    for name, after in candidate["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            delta = change(before.get(metric), after.get(metric))
+            if delta is None:
+                continue
+            worse = delta > args.threshold if metric in LOWER_IS_BETTER else delta < -args.threshold
+            if worse and metric in GATED:
+                regressions.append(f"{name}.{metric}")
+            rows.append({
+                "scenario": name,
+                "metric": metric,
+                "baseline": before.get(metric),
+                "candidate": after.get(metric),
+                "change_pct": round(delta, 1),
+                "regression": worse and metric in GATED,
+            })
+
+        before_errors, after_errors = error_rate(before), error_rate(after)
+        if before_errors is not None and after_errors is not None:
+            delta = (after_errors - before_errors) * 100
+            worse = delta > args.error_threshold
+            if worse:
+                regressions.append(f"{name}.error_rate")
+            rows.append({
+                "scenario": name,
+                "metric": "error_rate",
+                "baseline": round(before_errors, 4),
+                "candidate": round(after_errors, 4),
+                "change_points": round(delta, 2),
+                "regression": worse,
+            })
+
+    json.dump({
+        "baseline_commit": baseline.get("commit"),
+        "candidate_commit": candidate.get("commit"),
+        "threshold_pct": args.threshold,
+        "error_threshold_points": args.error_threshold,
+        "regressions": regressions,
+        "rows": rows,
+    }, sys.stdout, indent=2)
+    print()
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Answers /chat/completions with plausible summaries, question lists and word
+sets after a configurable delay, optionally streamed as SSE, and injects
+429/5xx errors at configurable rates. Point the backend at it with
+OPENROUTER_BASE_URL=http://127.0.0.1:<port>.
+
+    python -m benchmarks.fake_openrouter --port 8900 --latency-ms 300 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+WORD_CATEGORIES = ["easy", "medium", "hard"]
+
+class FakeOpenRouter:
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 50.0,
+        first_token_ms: float = 100.0,
+        chunk_ms: float = 5.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.first_token_ms = first_token_ms
+        self.chunk_ms = chunk_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "throttled": 0}
+
+    def _delay(self, base_ms: float) -> float:
+        return max(0.0, self.random.gauss(base_ms, self.jitter_ms)) / 1000
+
+    def _content(self, body: dict) -> str:
+        # Instructions live in the system message; the last message holds per-call details
+        messages = body["messages"]
+        prompt = " ".join(m["content"] for m in messages if m["role"] == "system") + " " + messages[-1]["content"]
+        schema = (body.get("response_format") or {}).get("json_schema", {}).get("schema", {})
+        properties = schema.get("properties", {})
+
+        if "questions" in properties or "study questions" in prompt:
+            count = properties.get("questions", {}).get("minItems", 5)
+            return json.dumps({"questions": [
+                f"What is the significance of concept {i + 1} in this text?" for i in range(count)
+            ]})
+        if properties or "English words" in prompt:
+            categories = list(properties) or [c for c in WORD_CATEGORIES if c in prompt] or WORD_CATEGORIES
+            return json.dumps({
+                c: [f"{c}word{i}" for i in range(properties.get(c, {}).get("minItems", 10))]
+                for c in categories
+            })
+        return "This text explains the key ideas of the material. " * 8
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.stats["requests"] += 1
+
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit exceeded", "code": 429}},
+                status=429,
+                headers={"Retry-After": "1"}
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            self.stats["errors"] += 1
+            await asyncio.sleep(self._delay(self.first_token_ms))
+            return web.json_response({"error": {"message": "Upstream error", "code": 502}}, status=502)
+
+        content = self._content(body)
+        if not body.get("stream"):
+            await asyncio.sleep(self._delay(self.latency_ms))
+            return web.json_response({
+                "id": "gen-fake",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+            })
+
+        self.stats["streamed"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        await asyncio.sleep(self._delay(self.first_token_ms))
+        for start in range(0, len(content), 16):
+            chunk = {"choices": [{"index": 0, "delta": {"content": content[start:start + 16]}}]}
+            await response.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+            await asyncio.sleep(self.chunk_ms / 1000)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def get_models(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": [{"id": "fake/model"}]})
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.chat_completions)
+        app.router.add_get("/models", self.get_models)
+        app.router.add_get("/_stats", self.get_stats)
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mean time to a full response")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--first-token-ms", type=float, default=100.0, help="mean time to the first streamed chunk")
+    parser.add_argument("--chunk-ms", type=float, default=5.0, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 502 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeOpenRouter(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        first_token_ms=args.first_token_ms,
+        chunk_ms=args.chunk_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed
+    )
+    web.run_app(fake.build_app(), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Deterministic fixture corpus for the load scenarios.
+
+Fixtures are generated on first use instead of being checked in:
+notes of several sizes, PDFs of 1/10/40 pages and page images at phone and
+scanner resolutions.
+"""
+import io
+import os
+import random
+from typing import Dict
+
+from PIL import Image, ImageDraw
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), ".corpus")
+
+_WORDS = (
+    "photosynthesis energy light chlorophyll glucose cell membrane protein enzyme "
+    "reaction equation history empire trade revolution economy language grammar "
+    "vocabulary sentence verb noun adjective theory experiment result analysis data"
+).split()
+
+NOTE_SIZES = {"short": 300, "medium": 3000, "long": 20000}
+PDF_PAGES = {"small": 1, "medium": 10, "large": 40}
+IMAGE_SIZES = {"phone": (1080, 1440), "scan": (2480, 3508)}
+
+def make_text(chars: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    paragraphs, paragraph, length = [], [], 0
+    while length < chars:
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        paragraph.append(sentence)
+        length += len(sentence) + 1
+        if len(paragraph) >= 5:
+            paragraphs.append(" ".join(paragraph))
+            paragraph = []
+    if paragraph:
+        paragraphs.append(" ".join(paragraph))
+    return "\n\n".join(paragraphs)[:chars]
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        text = make_text(2500, seed + page)
+        y = 750
+        for line_start in range(0, len(text), 90):
+            pdf.drawString(40, y, text[line_start:line_start + 90].replace("\n", " "))
+            y -= 14
+            if y < 40:
+                break
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def make_image(size, seed: int = 0) -> bytes:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    text = make_text(3000, seed)
+    y = 40
+    for line_start in range(0, len(text), 60):
+        draw.text((40, y), text[line_start:line_start + 60].replace("\n", " "), fill="black")
+        y += 24
+        if y > size[1] - 40:
+            break
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def ensure_corpus(directory: str = DEFAULT_CORPUS_DIR) -> Dict[str, Dict[str, str]]:
+    """Create missing fixtures and return their paths by kind and size."""
+    os.makedirs(directory, exist_ok=True)
+    corpus: Dict[str, Dict[str, str]] = {"notes": {}, "pdfs": {}, "images": {}}
+
+    def write(path: str, build) -> str:
+        if not os.path.exists(path):
+            data = build()
+            mode = "w" if isinstance(data, str) else "wb"
+            with open(path, mode, **({"encoding": "utf-8"} if mode == "w" else {})) as f:
+                f.write(data)
+        return path
+
+    for name, chars in NOTE_SIZES.items():
+        corpus["notes"][name] = write(os.path.join(directory, f"note_{name}.txt"), lambda c=chars: make_text(c))
+    for name, pages in PDF_PAGES.items():
+        corpus["pdfs"][name] = write(os.path.join(directory, f"doc_{name}.pdf"), lambda p=pages: make_pdf(p))
+    for name, size in IMAGE_SIZES.items():
+        corpus["images"][name] = write(os.path.join(directory, f"page_{name}.png"), lambda s=size: make_image(s))
+    return corpus
+
+def load(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
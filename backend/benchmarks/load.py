@@ -0,0 +1,326 @@
+"""Scripted load scenarios against the API with a local OpenRouter stand-in.
+
+Starts the fake OpenRouter server and the API (uvicorn) as subprocesses,
+drives each scenario at a fixed concurrency and prints machine-readable JSON
+with throughput, p50/p95/p99 latency and server RSS. Save the output per
+commit and diff runs with `python -m benchmarks.compare`.
+
+    python -m benchmarks.load --concurrency 16 --requests 200 --output bench.json
+    python -m benchmarks.load --scenarios summarize,extract-pdf --app-url http://127.0.0.1:8000
+    python -m benchmarks.load --workers 4  # production profile (gunicorn.conf.py)
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.fixtures import DEFAULT_CORPUS_DIR, ensure_corpus, load
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _note(corpus, size="medium") -> str:
+    with open(corpus["notes"][size], encoding="utf-8") as f:
+        return f.read()
+
+def _upload(path: str, content_type: str) -> Callable[[], aiohttp.FormData]:
+    data = load(path)
+    name = os.path.basename(path)
+
+    def build() -> aiohttp.FormData:
+        form = aiohttp.FormData()
+        form.add_field("file", data, filename=name, content_type=content_type)
+        return form
+    return build
+
+def build_scenarios(corpus) -> Dict[str, Dict]:
+    """Each scenario is a method, path and a factory for the request kwargs."""
+    note = _note(corpus)
+    image_form = _upload(corpus["images"]["phone"], "image/png")
+    pdf_form = _upload(corpus["pdfs"]["medium"], "application/pdf")
+    return {
+        "summarize": {"method": "POST", "path": "/api/summarize", "kwargs": lambda: {"json": {"text": note}}},
+        "generate-questions": {"method": "POST", "path": "/api/generate-questions", "kwargs": lambda: {"json": {"text": note}}},
+        "process-image": {"method": "POST", "path": "/api/process-image", "kwargs": lambda: {"data": image_form()}},
+        "extract-pdf": {"method": "POST", "path": "/api/extract-pdf", "kwargs": lambda: {"data": pdf_form()}},
+        "download-pdf": {"method": "POST", "path": "/api/download-pdf", "kwargs": lambda: {"json": {"text": note}}},
+        "words-random": {"method": "GET", "path": "/api/words/random", "kwargs": lambda: {}},
+    }
+
+def read_rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident set size from /proc (Linux only)."""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "rss_peak_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    values["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    values["rss_peak_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+def read_pss_mb(pid: int) -> Optional[float]:
+    """Proportional set size of a process and its children: pages shared
+    copy-on-write between forked workers are only counted once overall."""
+    total = 0
+    for process in [pid] + child_pids(pid):
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            return None
+    return round(total / 1024, 1)
+
+def child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_scenario(session: aiohttp.ClientSession, base_url: str, scenario: Dict, concurrency: int, requests: int, warmup: int, server_pid: Optional[int]) -> Dict:
+    url = base_url + scenario["path"]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def one(record: bool) -> None:
+        started = time.perf_counter()
+        try:
+            async with session.request(scenario["method"], url, **scenario["kwargs"]()) as response:
+                await response.read()
+                status = str(response.status)
+        except aiohttp.ClientError as e:
+            status = type(e).__name__
+        if record:
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    for _ in range(warmup):
+        await one(record=False)
+
+    remaining = {"count": requests}
+
+    async def worker():
+        while remaining["count"] > 0:
+            remaining["count"] -= 1
+            await one(record=True)
+
+    rss_samples: List[float] = []
+    stop = asyncio.Event()
+
+    async def sample_rss():
+        while not stop.is_set() and server_pid:
+            rss = read_rss_mb(server_pid)["rss_mb"]
+            if rss is not None:
+                rss_samples.append(rss)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    result = {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "status_counts": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "error_rate": round((len(latencies) - ok) / len(latencies), 4) if latencies else None,
+        # Successful requests only: fast 429s/5xx must not look like more throughput
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mean_ms": ms(statistics.mean(latencies)) if latencies else None,
+        "rss_max_mb": max(rss_samples) if rss_samples else None,
+    }
+    if server_pid:
+        result.update(read_rss_mb(server_pid))
+        result["pss_total_mb"] = read_pss_mb(server_pid)
+    return result
+
+def check_alive(processes: List[subprocess.Popen]) -> None:
+    """Fail the run if the API or the fake upstream exited (e.g. a port already in use)."""
+    for process in processes:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args[2]} exited with status {process.returncode}")
+
+async def watch_processes(processes: List[subprocess.Popen], interval: float = 0.5) -> None:
+    """Raises as soon as one of the processes exits; runs until cancelled otherwise."""
+    while True:
+        check_alive(processes)
+        await asyncio.sleep(interval)
+
+async def run_watched(coro, watcher: asyncio.Task):
+    """Await coro, aborting it if the watcher fails first."""
+    task = asyncio.ensure_future(coro)
+    await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    if not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await watcher  # raises the process failure
+    return task.result()
+
+async def wait_until_up(url: str, timeout: float = 60.0, processes: List[subprocess.Popen] = ()) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            # Otherwise a process that died at startup looks like a slow one until the timeout
+            check_alive(processes)
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_processes(args, data_dir: str) -> List[subprocess.Popen]:
+    fake = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_openrouter",
+            "--port", str(args.fake_port),
+            "--latency-ms", str(args.upstream_latency_ms),
+            "--error-rate", str(args.upstream_error_rate),
+            "--throttle-rate", str(args.upstream_throttle_rate),
+        ],
+        cwd=BACKEND_DIR
+    )
+    env = dict(
+        os.environ,
+        OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.fake_port}",
+        OPENROUTER_API_KEY=os.environ.get("OPENROUTER_API_KEY", "benchmark"),
+        OPENROUTER_RATE_LIMIT_PER_MINUTE="1000000",
+        OPENROUTER_STREAM="true" if args.stream else "false",
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+        # Fresh job queue, document store and rate-limit state per run; no near-duplicate
+        # hits, or repeated requests would be answered from the cache instead of measured
+        DATA_DIR=data_dir,
+        SIMILARITY_CACHE_ENABLED="false",
+    )
+    if args.workers:
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app",
+            "--workers", str(args.workers), "--bind", f"127.0.0.1:{args.app_port}", "--log-level", "warning",
+        ]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port), "--log-level", "warning"]
+    api = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    return [fake, api]
+
+async def main_async(args) -> Dict:
+    corpus = ensure_corpus(args.corpus_dir)
+    scenarios = build_scenarios(corpus)
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    processes: List[subprocess.Popen] = []
+    data_dir = None
+    base_url = args.app_url
+    server_pid = args.server_pid
+    if not base_url:
+        data_dir = tempfile.mkdtemp(prefix="load-data-")
+        processes = start_processes(args, data_dir)
+        base_url = f"http://127.0.0.1:{args.app_port}"
+        server_pid = processes[1].pid
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output",)},
+        "scenarios": {},
+    }
+    # With an external --app-url there is nothing to watch and this just sleeps
+    watcher = asyncio.ensure_future(watch_processes(processes))
+    try:
+        if processes:
+            await wait_until_up(f"http://127.0.0.1:{args.fake_port}/models", processes=processes)
+            # Measure a warmed-up server, not the cold first requests
+            await wait_until_up(base_url + "/ready", processes=processes)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            for name in selected:
+                # A crashed server would otherwise show up as a scenario full of connection errors
+                report["scenarios"][name] = await run_watched(run_scenario(
+                    session, base_url, scenarios[name], args.concurrency, args.requests, args.warmup, server_pid
+                ), watcher)
+                print(f"{name}: {report['scenarios'][name]['throughput_rps']} req/s", file=sys.stderr)
+    finally:
+        watcher.cancel()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", help="comma separated subset (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--app-url", help="benchmark an already running API instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid to sample RSS from when using --app-url")
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--upstream-latency-ms", type=float, default=200.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="have the API request streamed completions")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--workers", type=int, default=0, help="run the API under gunicorn with this many workers (0: single uvicorn process)")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Throughput scaling of the production profile from 1 to N workers.
+
+Runs the load scenarios once per worker count under gunicorn
+(gunicorn.conf.py) against the fake OpenRouter server and prints a JSON
+report plus a table of throughput and speed-up relative to one worker.
+Run it on the hardware you deploy to; results are only meaningful up to
+the number of cores the machine has.
+
+    python -m benchmarks.scaling --worker-counts 1,2,4,8 --scenarios summarize,download-pdf --output scaling.json
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from benchmarks.load import build_parser, git_commit, main_async
+
+def main():
+    parser = build_parser()
+    parser.description = __doc__
+    parser.add_argument("--worker-counts", default="1,2,4", help="comma separated gunicorn worker counts")
+    parser.set_defaults(concurrency=32, requests=400)
+    args = parser.parse_args()
+    counts = [int(count) for count in args.worker_counts.split(",")]
+
+    runs = {}
+    for count in counts:
+        args.workers = count
+        print(f"--- {count} worker(s)", file=sys.stderr)
+        runs[count] = asyncio.run(main_async(args))["scenarios"]
+        # Let the previous server release its port
+        time.sleep(1)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "workers", "worker_counts")},
+        "workers": {str(count): scenarios for count, scenarios in runs.items()},
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    baseline = runs[counts[0]]
+    print(f"\n{'scenario':<20} {'workers':>7} {'req/s':>9} {'speed-up':>9} {'p95 ms':>9} {'PSS MB':>8}", file=sys.stderr)
+    for name in baseline:
+        for count in counts:
+            result = runs[count][name]
+            speedup = result["throughput_rps"] / baseline[name]["throughput_rps"] if baseline[name]["throughput_rps"] else 0
+            print(
+                f"{name:<20} {count:>7} {result['throughput_rps']:>9} {speedup:>8.2f}x {result['p95_ms']:>9} {result.get('pss_total_mb') or '-':>8}",
+                file=sys.stderr
+            )
+
+if __name__ == "__main__":
+    main()
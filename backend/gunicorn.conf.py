@@ -0,0 +1,37 @@
+"""Production server profile: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every knob can be overridden from the environment (WEB_CONCURRENCY, PORT,
+...) or on the command line (`-w 4`).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Conservative default: each worker loads its own tokenizer, OCR engines and
+# executor threads, and container CPU counts often report the host's cores.
+# Raise it with WEB_CONCURRENCY after measuring (see benchmarks/README.md).
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+# Uvicorn picks uvloop and httptools when they are installed (uvicorn[standard])
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once in the master so the tokenizer tables and other
+# read-only module state are shared copy-on-write by the forked workers
+preload_app = True
+
+# Long OCR / LLM chains; keep in line with the upstream timeout and retries
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+accesslog = None
+errorlog = "-"
+
+# One token bucket for all workers instead of one per process. Set before
+# the app (and its settings) are imported by preload.
+os.environ.setdefault("OPENROUTER_SHARED_RATE_LIMIT", "true")
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Settings are read at import time; keep tests off the real key and data directory
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="ai-study-helper-tests-"))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("SIMILARITY_CACHE_ENABLED", "false")
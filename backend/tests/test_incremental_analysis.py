@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.services import incremental_analysis
+from app.services.incremental_analysis import (
+    DocumentStore, IncrementalAnalyzer, _ends_segment, segment_hash, split_segments
+)
+
+TARGET = 400
+
+def make_paragraphs(count):
+    return [
+        f"Paragraph {i} covers topic {i * 7 % 13}. " + " ".join(f"word{i}_{j}" for j in range(8 + i % 11))
+        for i in range(count)
+    ]
+
+def hashes(paragraphs):
+    return [segment_hash(segment) for segment in split_segments("\n\n".join(paragraphs), TARGET)]
+
+def edit(paragraph, keep_boundary):
+    """An edited paragraph that keeps (or flips) whether a segment ends after it."""
+    for n in range(1, 200):
+        edited = paragraph + f" inserted{n}"
+        if (_ends_segment(edited, TARGET) == _ends_segment(paragraph, TARGET)) == keep_boundary:
+            return edited
+    raise AssertionError("no suitable edit found")
+
+def test_segments_are_grouped_near_target_size():
+    segments = split_segments("\n\n".join(make_paragraphs(200)), TARGET)
+    assert 1 < len(segments) < 200
+    assert all(len(segment) <= 5 * TARGET for segment in segments)
+
+def test_edit_only_changes_its_own_segment():
+    paragraphs = make_paragraphs(120)
+    before = hashes(paragraphs)
+    for k in (0, 37, 60, 119):
+        edited = list(paragraphs)
+        edited[k] = edit(paragraphs[k], keep_boundary=True)
+        after = hashes(edited)
+        assert len(after) == len(before)
+        assert sum(a != b for a, b in zip(before, after)) == 1
+
+def test_moved_boundary_only_touches_the_next_segment():
+    paragraphs = make_paragraphs(120)
+    before = hashes(paragraphs)
+    edited = list(paragraphs)
+    edited[50] = edit(paragraphs[50], keep_boundary=False)
+    after = hashes(edited)
+    # Everything outside the two segments around the edit is unchanged
+    unchanged = set(before) & set(after)
+    assert len(unchanged) >= len(before) - 2
+    assert len(unchanged) >= len(after) - 2
+
+def test_early_edit_does_not_shift_later_segments():
+    paragraphs = make_paragraphs(120)
+    before = hashes(paragraphs)
+    edited = list(paragraphs)
+    # Adding a whole paragraph near the start used to move every later boundary
+    edited.insert(3, "A brand new paragraph with a few extra words in it.")
+    after = hashes(edited)
+    assert before[-5:] == after[-5:]
+
+class FakeOpenRouter:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def summarize_segment(self, text):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_on is not None and self.fail_on in text:
+                raise RuntimeError("upstream failed")
+            return f"summary of {len(text)} chars"
+        finally:
+            self.in_flight -= 1
+
+    async def merge_summaries(self, summaries):
+        return " ".join(summaries)
+
+def test_segment_calls_are_bounded_and_saved_as_they_finish(tmp_path, monkeypatch):
+    paragraphs = make_paragraphs(120)
+    fake = FakeOpenRouter(fail_on=paragraphs[-1])
+    monkeypatch.setattr(incremental_analysis, "get_openrouter_service", lambda: fake)
+    store = DocumentStore(str(tmp_path / "documents.db"), max_versions=5)
+    analyzer = IncrementalAnalyzer(store, TARGET, concurrency=3)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(analyzer.analyze("doc", "\n\n".join(paragraphs), include_questions=False))
+    assert fake.max_in_flight == 3
+    # Every segment but the failed one was kept for the retry
+    segment_hashes = hashes(paragraphs)
+    assert len(store.segment_summaries(segment_hashes)) == len(segment_hashes) - 1
+
+    fake.fail_on = None
+    result = asyncio.run(analyzer.analyze("doc", "\n\n".join(paragraphs), include_questions=False))
+    assert result["segments_recomputed"] == 1
+
+def test_pruned_versions_drop_their_unshared_segment_summaries(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"), max_versions=1)
+    store.save_segment_summaries({"a": "A", "b": "B", "c": "C"})
+    store.save_version("doc", ["a", "b"], "summary", None)
+    store.save_version("other", ["b"], "summary", None)
+    # Version 1 of "doc" is pruned: "a" goes, "b" is still used by "other"
+    store.save_version("doc", ["c"], "summary", None)
+    assert set(store.segment_summaries(["a", "b", "c"])) == {"b", "c"}
+
+def test_old_unreferenced_segment_summaries_expire(tmp_path, monkeypatch):
+    store = DocumentStore(str(tmp_path / "documents.db"), max_versions=5, max_segment_age=60)
+    store.save_segment_summaries({"kept": "K", "orphan": "O"})
+    monkeypatch.setattr(incremental_analysis.time, "time", lambda: 1e10)
+    store.save_segment_summaries({"fresh": "F"})
+    store.save_version("doc", ["kept"], "summary", None)
+    assert set(store.segment_summaries(["kept", "orphan", "fresh"])) == {"kept", "fresh"}
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import job_worker
+from app.services.job_queue import DONE, FAILED, JobQueue
+from app.services.job_worker import LeaseLost, run_leased
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+def test_retry_waits_until_not_before(queue):
+    queue.submit("text", b"hello")
+    job = queue.claim(60, max_attempts=3)
+    queue.fail(job["id"], "throttled", retry=True, delay=0.2)
+    assert queue.claim(60, max_attempts=3) is None
+    time.sleep(0.25)
+    assert queue.claim(60, max_attempts=3)["attempts"] == 2
+
+def test_job_that_keeps_losing_its_lease_is_failed(queue):
+    job, _ = queue.submit("text", b"crashes the worker")
+    for _ in range(2):
+        assert queue.claim(0, max_attempts=2) is not None
+        time.sleep(0.01)  # lease of 0s: expired at once, as if the worker died
+    assert queue.claim(0, max_attempts=2) is None
+    failed = queue.get(job["id"])
+    assert failed["status"] == FAILED
+    assert "lease expired" in failed["error"]
+
+def test_renew_fails_after_another_worker_reclaims(queue):
+    queue.submit("text", b"slow")
+    first = queue.claim(0, max_attempts=3)
+    time.sleep(0.01)
+    second = queue.claim(60, max_attempts=3)
+    assert second["id"] == first["id"]
+    assert not queue.renew(first["id"], first["attempts"], 60)
+    assert queue.renew(second["id"], second["attempts"], 60)
+
+def test_heartbeat_keeps_a_long_stage_leased(queue, monkeypatch):
+    monkeypatch.setattr(job_worker.settings, "JOB_LEASE_SECONDS", 0.3)
+
+    async def slow_job(queue, job):
+        await asyncio.sleep(1.0)  # longer than the lease
+        queue.complete(job["id"], {})
+
+    monkeypatch.setattr(job_worker, "run_job", slow_job)
+    queue.submit("text", b"long stage")
+    job = queue.claim(0.3, max_attempts=3)
+
+    async def scenario():
+        running = asyncio.ensure_future(run_leased(queue, job))
+        await asyncio.sleep(0.6)
+        # Past the original lease, but the heartbeat has renewed it
+        assert queue.claim(0.3, max_attempts=3) is None
+        await running
+
+    asyncio.run(scenario())
+    assert queue.get(job["id"])["status"] == DONE
+
+def test_lost_lease_stops_the_job(queue, monkeypatch):
+    monkeypatch.setattr(job_worker.settings, "JOB_LEASE_SECONDS", 0.15)
+    cancelled = []
+
+    async def slow_job(queue, job):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    monkeypatch.setattr(job_worker, "run_job", slow_job)
+    queue.submit("text", b"stolen")
+    job = queue.claim(0, max_attempts=3)
+    time.sleep(0.01)
+    queue.claim(60, max_attempts=3)  # another worker takes over
+
+    with pytest.raises(LeaseLost):
+        asyncio.run(run_leased(queue, job))
+    assert cancelled
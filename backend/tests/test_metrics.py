@@ -0,0 +1,42 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import HTTP_REQUEST_SECONDS, MetricsMiddleware
+
+def make_app() -> FastAPI:
+    words, vocab, jobs = APIRouter(), APIRouter(), APIRouter()
+
+    @words.get("/random")
+    def random_words():
+        return {}
+
+    @vocab.get("/random")
+    def random_vocab():
+        return {}
+
+    @jobs.get("/{job_id}")
+    def get_job(job_id: str):
+        return {}
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(words, prefix="/test/words")
+    app.include_router(vocab, prefix="/test/vocab")
+    app.include_router(jobs, prefix="/test/jobs")
+    return app
+
+def routes_seen():
+    return {labels[1] for labels in HTTP_REQUEST_SECONDS.series if labels[1].startswith("/test")}
+
+def test_routes_are_labelled_with_their_full_template():
+    with TestClient(make_app()) as client:
+        client.get("/test/words/random")
+        client.get("/test/vocab/random")
+        client.get("/test/jobs/abc123")
+        client.get("/test/jobs/def456")
+    assert routes_seen() == {"/test/words/random", "/test/vocab/random", "/test/jobs/{job_id}"}
+
+def test_unmatched_paths_share_one_label():
+    with TestClient(make_app()) as client:
+        client.get("/test/nowhere/1")
+    assert ("GET", "unmatched", "404") in HTTP_REQUEST_SECONDS.series
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.core import deadline
+from app.core.deadline import DeadlineExceeded, RequestBudget
+from app.services import ocr_service
+from app.services.ocr_layout import OCRLayout
+
+class FakeEngine:
+    def __init__(self, finishes):
+        self.finishes = finishes
+        self.timeouts = []
+        self.cleared = False
+
+    def SetPageSegMode(self, psm):
+        pass
+
+    def SetImage(self, image):
+        pass
+
+    def Recognize(self, timeout=0):
+        self.timeouts.append(timeout)
+        return self.finishes
+
+    def GetUTF8Text(self):
+        return "text"
+
+    def Clear(self):
+        self.cleared = True
+
+def recognize_with(monkeypatch, engine, budget_seconds):
+    monkeypatch.setattr(ocr_service, "tesserocr", object())
+    monkeypatch.setattr(ocr_service._engines, "get", lambda lang: engine)
+    token = deadline._budget.set(RequestBudget(budget_seconds) if budget_seconds else None)
+    try:
+        return ocr_service.recognize(np.zeros((10, 10), dtype=np.uint8), OCRLayout("eng", 6, "latin"))
+    finally:
+        deadline._budget.reset(token)
+
+def test_tesserocr_gets_the_request_deadline(monkeypatch):
+    engine = FakeEngine(finishes=True)
+    assert recognize_with(monkeypatch, engine, 5.0) == "text"
+    assert 4000 < engine.timeouts[0] <= 5000
+    assert engine.cleared
+
+def test_tesserocr_timeout_raises_deadline_exceeded(monkeypatch):
+    engine = FakeEngine(finishes=False)
+    with pytest.raises(DeadlineExceeded):
+        recognize_with(monkeypatch, engine, 5.0)
+    assert engine.cleared
+
+def test_no_deadline_outside_requests(monkeypatch):
+    engine = FakeEngine(finishes=True)
+    recognize_with(monkeypatch, engine, None)
+    assert engine.timeouts == [0]
@@ -0,0 +1,168 @@
+"""UpstreamGuard against the fake OpenRouter server from benchmarks/."""
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+from app.services.resilience import CircuitBreaker, UpstreamGuard, UpstreamUnavailableError
+from benchmarks.fake_openrouter import FakeOpenRouter
+
+BODY = {"model": "fake/model", "messages": [{"role": "user", "content": "Summarize this."}]}
+
+def make_fake(**options) -> FakeOpenRouter:
+    # No latency or jitter unless a test asks for it
+    defaults = {"latency_ms": 0.0, "jitter_ms": 0.0, "first_token_ms": 0.0}
+    return FakeOpenRouter(**{**defaults, **options})
+
+def make_guard(timeout=2.0, max_retries=2, backoff_max=2.0, failure_threshold=5, reset_timeout=30.0) -> UpstreamGuard:
+    return UpstreamGuard(
+        max_concurrency=4,
+        rate_per_minute=60000,
+        timeout=timeout,
+        max_retries=max_retries,
+        backoff_base=0.01,
+        backoff_max=backoff_max,
+        breaker=CircuitBreaker(failure_threshold, reset_timeout),
+    )
+
+def run(fake: FakeOpenRouter, scenario):
+    """Serve `fake` on a local port and run `scenario(send)`, where send is one HTTP attempt."""
+    async def main():
+        server = TestServer(fake.build_app())
+        await server.start_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def send():
+                    async with session.post(server.make_url("/chat/completions"), json=BODY) as response:
+                        return response.status, response.headers.get("Retry-After"), await response.text()
+                return await scenario(send)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_success_passes_through():
+    fake = make_fake()
+    guard = make_guard()
+    status, body = run(fake, lambda send: guard.call(send))
+    assert status == 200
+    assert "choices" in body
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.counters["attempts"] == 1
+
+def test_server_errors_are_retried_until_exhausted():
+    fake = make_fake(error_rate=1.0)
+    guard = make_guard(max_retries=2)
+    with pytest.raises(UpstreamUnavailableError, match="status 502"):
+        run(fake, lambda send: guard.call(send))
+    assert fake.stats["errors"] == 3
+    assert guard.counters["server_errors"] == 3
+    assert guard.counters["retries"] == 2
+    assert guard.breaker.failures == 3
+
+def test_server_error_then_success():
+    fake = make_fake(error_rate=1.0)
+    guard = make_guard(max_retries=2)
+
+    async def scenario(send):
+        async def flaky():
+            result = await send()
+            fake.error_rate = 0.0  # upstream recovers after the first attempt
+            return result
+        return await guard.call(flaky)
+
+    status, _ = run(fake, scenario)
+    assert status == 200
+    assert guard.counters["retries"] == 1
+    assert guard.breaker.failures == 0
+
+def test_429_waits_for_retry_after():
+    fake = make_fake(throttle_rate=1.0)  # answers 429 with Retry-After: 1
+    guard = make_guard(max_retries=1, backoff_max=2.0)
+    started = time.monotonic()
+    with pytest.raises(UpstreamUnavailableError) as error:
+        run(fake, lambda send: guard.call(send))
+    assert time.monotonic() - started >= 1.0
+    assert fake.stats["throttled"] == 2
+    assert error.value.retry_after == 1.0
+    # Throttling means the upstream is alive
+    assert guard.breaker.failures == 0
+
+def test_429_with_retry_after_beyond_backoff_max_fails_fast():
+    fake = make_fake(throttle_rate=1.0)
+    guard = make_guard(max_retries=3, backoff_max=0.5)
+    started = time.monotonic()
+    with pytest.raises(UpstreamUnavailableError):
+        run(fake, lambda send: guard.call(send))
+    assert time.monotonic() - started < 1.0
+    assert fake.stats["throttled"] == 1
+
+def test_breaker_opens_then_half_open_probe_closes_it():
+    fake = make_fake(error_rate=1.0)
+    guard = make_guard(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+
+    async def scenario(send):
+        for _ in range(2):
+            with pytest.raises(UpstreamUnavailableError, match="status 502"):
+                await guard.call(send)
+        assert guard.breaker.state == CircuitBreaker.OPEN
+
+        # Open: rejected without reaching the upstream
+        requests = fake.stats["requests"]
+        with pytest.raises(UpstreamUnavailableError, match="circuit is open"):
+            await guard.call(send)
+        assert fake.stats["requests"] == requests
+
+        # After the cool-down one probe goes through; a failing probe re-opens the circuit
+        await asyncio.sleep(0.25)
+        with pytest.raises(UpstreamUnavailableError, match="status 502"):
+            await guard.call(send)
+        assert guard.breaker.state == CircuitBreaker.OPEN
+        assert guard.breaker.times_opened == 2
+
+        # A successful probe closes it
+        fake.error_rate = 0.0
+        await asyncio.sleep(0.25)
+        status, _ = await guard.call(send)
+        assert status == 200
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    run(fake, scenario)
+
+def test_half_open_admits_one_probe_while_older_calls_finish():
+    fake = make_fake(latency_ms=100.0)
+    guard = make_guard(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    async def scenario(send):
+        # Started while closed; still running when the breaker goes half-open
+        old = asyncio.ensure_future(guard.call(send))
+        await asyncio.sleep(0.01)
+        guard.breaker.record_failure()
+        assert guard.breaker.state == CircuitBreaker.OPEN
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.ensure_future(guard.call(send))
+        await asyncio.sleep(0)
+        assert guard.breaker.probe_in_flight
+
+        # The old call ends without a result (e.g. it lost a hedge); that must not free the probe slot
+        old.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await old
+        with pytest.raises(UpstreamUnavailableError, match="probe in flight"):
+            await guard.call(send)
+
+        status, _ = await probe
+        assert status == 200
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+    run(fake, scenario)
+
+def test_timeouts_count_as_failures():
+    fake = make_fake(latency_ms=300.0)
+    guard = make_guard(timeout=0.05, max_retries=1)
+    with pytest.raises(UpstreamUnavailableError, match="timed out"):
+        run(fake, lambda send: guard.call(send))
+    assert guard.counters["timeouts"] == 2
+    assert guard.breaker.failures == 2
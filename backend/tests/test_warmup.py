@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+from app.services import warmup
+
+def run_ocr_step(monkeypatch, available=True, with_tesserocr=True, fail=False):
+    loaded = []
+
+    def warm_up_engine(lang):
+        loaded.append(threading.current_thread().name)
+        return lang
+
+    def extract(image):
+        if fail:
+            raise RuntimeError("model missing")
+        return "text"
+
+    monkeypatch.setattr(warmup, "tesseract_available", lambda: available)
+    monkeypatch.setattr(warmup, "tesserocr", object() if with_tesserocr else None)
+    monkeypatch.setattr(warmup, "warm_up_engine", warm_up_engine)
+    monkeypatch.setattr(warmup.OCRService, "_extract_text_sync", staticmethod(extract))
+    step = warmup.WarmUp(["ocr"], step_timeout=10)
+    asyncio.run(step.run())
+    return step, loaded
+
+def test_engines_are_loaded_on_every_executor_thread(monkeypatch):
+    step, loaded = run_ocr_step(monkeypatch)
+    assert step.ready
+    assert len(set(loaded)) == warmup.settings.EXECUTOR_WORKERS
+
+def test_ocr_failure_keeps_the_instance_not_ready(monkeypatch):
+    step, _ = run_ocr_step(monkeypatch, fail=True)
+    assert not step.ready
+    assert step.report()["status"] == "failed"
+
+def test_missing_tesseract_skips_ocr_without_blocking(monkeypatch):
+    step, loaded = run_ocr_step(monkeypatch, available=False)
+    assert step.ready
+    assert step.results["ocr"]["status"] == "skipped"
+    assert not loaded
+
+def test_upstream_failure_does_not_block(monkeypatch):
+    async def failing():
+        raise ConnectionError("no route")
+    monkeypatch.setitem(warmup.STEPS, "upstream", failing)
+    step = warmup.WarmUp(["upstream"], step_timeout=10)
+    asyncio.run(step.run())
+    assert step.ready
+    assert step.results["upstream"]["status"] == "failed"
@@ -1,13 +1,63 @@
+import argparse
+import codecs
 import json
-import requests
 import os
+import re
+import struct
+import requests
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Where the web app imports the JSON from, and where the backend reads the binary store
+# (DATA_DIR, relative to backend/ unless absolute, as in backend/app/core/settings.py)
+DEFAULT_JSON_PATH = os.path.join(SCRIPT_DIR, "..", "src", "data", "words_ja.json")
+DEFAULT_BINARY_PATH = os.path.join(SCRIPT_DIR, "..", "..", "backend", os.environ.get("DATA_DIR", "data"), "words_ja.bin")
+
+MAGIC = b"JLPTVOC1"
+ALIGN = 8
+
+# Meaning words too common to be useful as search keywords
+STOPWORDS = {"a", "an", "the", "to", "of", "or", "and", "in", "on", "be", "is", "at", "for", "with", "by", "as", "one", "s"}
 
-def fetch_jlpt_words():
-    """Fetch words from the JLPT API."""
-    url = "https://jlpt-vocab-api.vercel.app/api/words/all"
-    response = requests.get(url)
+def fetch_jlpt_words(url="https://jlpt-vocab-api.vercel.app/api/words/all", chunk_size=64 * 1024):
+    """Stream words from the JLPT API one at a time instead of loading the whole body.
+
+    The endpoint returns one JSON array of word objects; objects are decoded
+    as soon as they are complete in the buffer.
+    """
+    response = requests.get(url, stream=True)
     response.raise_for_status()  # Raise an error for bad HTTP responses
-    return response.json()
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        while True:
+            # Skip whitespace, separators and the opening bracket
+            while position < len(buffer) and buffer[position] in " \t\r\n,[":
+                if buffer[position] == "[":
+                    started = True
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            if not started:
+                raise ValueError("Expected a JSON array of words")
+            try:
+                word, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Object continues in the next chunk
+                break
+            position = end
+            yield word
+
+    # Only the closing bracket marks a complete list; anything else is a cut-off download
+    raise ValueError("JLPT word list ended before the closing ']' (truncated response)")
 
 def process_words(words):
     """Process and sort words by difficulty level."""
@@ -16,12 +66,12 @@ def process_words(words):
         "medium": [],  # N4-N3 words
         "hard": []     # N2-N1 words
     }
-    
+
     for word in words:
         # Validate word structure
         if not all(key in word for key in ["word", "meaning", "furigana", "romaji", "level"]):
             continue
-            
+
         # Sort by level
         if word["level"] == 5:
             processed["easy"].append(word)
@@ -29,32 +79,140 @@ def process_words(words):
             processed["medium"].append(word)
         elif word["level"] in [1, 2]:
             processed["hard"].append(word)
-            
+
     return processed
 
 def save_to_json(data, target_path="words_ja.json"):
     """Save processed data to a JSON file."""
     # Ensure the directory exists
-    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-    
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+
     with open(target_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
     print(f"Successfully saved to {target_path}")
 
+def romaji_key(word):
+    return word["romaji"].strip().lower()
+
+def kana_key(word):
+    return (word["furigana"] or word["word"]).strip()
+
+def meaning_keywords(meaning):
+    return {token for token in re.findall(r"[a-z]+", meaning.lower()) if token not in STOPWORDS}
+
+def save_to_binary(data, target_path="words_ja.bin"):
+    """Save processed words in the memory-mappable format read by the backend.
+
+    Layout (little endian), see backend/app/services/vocab_store.py:
+    MAGIC, u32 section count, then (name[8], u64 offset, u64 length) per
+    section. Sections are 8-byte aligned arrays:
+
+    - strofs (u32) / strings: deduplicated UTF-8 string table
+    - word, furi, romaji, meaning (u32): string ids per record
+    - level (u8): JLPT level per record; records are sorted by level
+    - lvlrng (u32): [start, end) record range for levels 0..5
+    - byromaji, bykana (u32): record ids sorted by romaji / kana key
+    - kwterms (u32), kwofs (u32), kwpost (u32): meaning keywords (sorted
+      string ids) with their postings lists of record ids
+    """
+    words = [word for category in ("hard", "medium", "easy") for word in data[category]]
+    words.sort(key=lambda word: (word["level"], romaji_key(word)))
+
+    strings = {}
+    string_bytes = []
+
+    def intern(value):
+        value = value or ""
+        if value not in strings:
+            strings[value] = len(string_bytes)
+            string_bytes.append(value.encode("utf-8"))
+        return strings[value]
+
+    columns = {name: [intern(word[field]) for word in words]
+               for name, field in (("word", "word"), ("furi", "furigana"), ("romaji", "romaji"), ("meaning", "meaning"))}
+    levels = [word["level"] for word in words]
+
+    level_ranges = []
+    for level in range(6):
+        indexes = [i for i, value in enumerate(levels) if value == level]
+        level_ranges += [indexes[0], indexes[-1] + 1] if indexes else [0, 0]
+
+    by_romaji = sorted(range(len(words)), key=lambda i: romaji_key(words[i]))
+    by_kana = sorted(range(len(words)), key=lambda i: kana_key(words[i]))
+
+    postings = {}
+    for i, word in enumerate(words):
+        for keyword in meaning_keywords(word["meaning"]):
+            postings.setdefault(keyword, []).append(i)
+    keywords = sorted(postings)
+    keyword_offsets = [0]
+    keyword_postings = []
+    for keyword in keywords:
+        keyword_postings += postings[keyword]
+        keyword_offsets.append(len(keyword_postings))
+    keyword_ids = [intern(keyword) for keyword in keywords]
+
+    string_offsets = [0]
+    for value in string_bytes:
+        string_offsets.append(string_offsets[-1] + len(value))
+
+    def u32(values):
+        return struct.pack(f"<{len(values)}I", *values)
+
+    sections = [
+        (b"strofs", u32(string_offsets)),
+        (b"strings", b"".join(string_bytes)),
+        (b"word", u32(columns["word"])),
+        (b"furi", u32(columns["furi"])),
+        (b"romaji", u32(columns["romaji"])),
+        (b"meaning", u32(columns["meaning"])),
+        (b"level", bytes(levels)),
+        (b"lvlrng", u32(level_ranges)),
+        (b"byromaji", u32(by_romaji)),
+        (b"bykana", u32(by_kana)),
+        (b"kwterms", u32(keyword_ids)),
+        (b"kwofs", u32(keyword_offsets)),
+        (b"kwpost", u32(keyword_postings)),
+    ]
+
+    header_size = len(MAGIC) + 4 + len(sections) * 24
+    offset = -(-header_size // ALIGN) * ALIGN
+    directory = []
+    for name, payload in sections:
+        directory.append(struct.pack("<8sQQ", name, offset, len(payload)))
+        offset += -(-len(payload) // ALIGN) * ALIGN
+
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+    # Write next to the target and rename, so a running backend never maps a half-written file
+    temp_path = target_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(sections)) + b"".join(directory))
+        for name, payload in sections:
+            f.write(b"\0" * (-f.tell() % ALIGN))
+            f.write(payload)
+    os.replace(temp_path, target_path)
+    print(f"Successfully saved {len(words)} words to {target_path} ({os.path.getsize(target_path)} bytes)")
+
 def main():
-    print("Fetching words from API...")
-    words = fetch_jlpt_words()
-    
-    print("Processing words...")
-    processed_words = process_words(words)
-    
-    print("Saving to words_ja.json...")
-    save_to_json(processed_words, target_path="./words_ja.json")
-    
+    parser = argparse.ArgumentParser(description="Fetch the JLPT word list and build the vocabulary files.")
+    parser.add_argument("--output", default=os.path.normpath(DEFAULT_BINARY_PATH),
+                        help="binary vocabulary store served by the backend (default: backend DATA_DIR)")
+    parser.add_argument("--json", default=os.path.normpath(DEFAULT_JSON_PATH),
+                        help="grouped words as JSON for the web app (default: web/src/data/words_ja.json)")
+    parser.add_argument("--no-json", action="store_true", help="skip the JSON file")
+    args = parser.parse_args()
+
+    print("Fetching and processing words...")
+    processed_words = process_words(fetch_jlpt_words())
+
+    print(f"Saving to {args.output}...")
+    save_to_binary(processed_words, target_path=args.output)
+    if not args.no_json:
+        save_to_json(processed_words, target_path=args.json)
+
     print("\nStatistics:")
     for category, word_list in processed_words.items():
         print(f"{category}: {len(word_list)} words")
 
 if __name__ == "__main__":
     main()
-